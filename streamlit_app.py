@@ -2,16 +2,27 @@ import streamlit as st
 from groq import Groq
 from huggingface_hub import InferenceClient
 import google.generativeai as genai
-import os, base64, requests, json
+import os, requests
 import re
 from PIL import Image
 import io
 import urllib.parse
 import time
 import hashlib
+import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from zetro_vision import image_hash, preprocess_image
+from zetro_memory import MemoryIndex, get_embedder, message_key, new_session_id, session_id
+from zetro_store import open_store
+from zetro_archive import ArchiveCompactor, SessionArchive
+from zetro_local import create_engine
+from zetro_router import classify_turn, pick_engine
+from zetro_docs import doc_kind, estimate_tokens, ingest_document, search_documents, spool_upload
+from zetro_assets import REMOTE_ASSETS, asset_url, start_fetch
 
 # --- 1. CONFIG & SYSTEM SETUP ---
-st.set_page_config(page_title="ZETRO", page_icon="assets/logo.png", layout="wide")
+st.set_page_config(page_title="ZETRO", page_icon="static/logo.png", layout="wide")
 
 # Simple Session State (No Cookies - lebih stabil!)
 if "cookies_ready" not in st.session_state:
@@ -22,26 +33,51 @@ DB_FOLDER = "zetro_users_db"
 if not os.path.exists(DB_FOLDER):
     os.makedirs(DB_FOLDER)
 
-# File untuk user credentials
-USERS_FILE = os.path.join(DB_FOLDER, "users.json")
+def get_setting(name, default=""):
+    """Setting opsional dari secrets, fallback ke env"""
+    try:
+        value = st.secrets.get(name)
+    except Exception:
+        value = None
+    return value or os.environ.get(name, default)
+
+# Storage backend (file lokal / SQLite / Redis), dipilih dari ZETRO_STORE_URL.
+# Replica yang jalan di belakang load balancer harus pakai URL yang sama.
+
+@st.cache_resource
+def get_store(url):
+    """Satu store per proses (connection pool / client di-share antar session)"""
+    return open_store(url, DB_FOLDER)
+
+STORE = get_store(get_setting("ZETRO_STORE_URL"))
+
+# Cold storage: session yang ga disentuh ZETRO_ARCHIVE_DAYS hari dipindah ke
+# arsip terkompres, di-restore lazy pas dibuka. Folder arsip harus shared
+# antar replica kalau store-nya shared.
+ARCHIVE_DAYS = float(get_setting("ZETRO_ARCHIVE_DAYS", "30"))
+ARCHIVE_IO_BYTES_PER_SEC = int(get_setting("ZETRO_ARCHIVE_IO_BPS", str(2 * 1024 * 1024)))
+
+@st.cache_resource
+def get_archive(folder):
+    """Satu SessionArchive per proses"""
+    return SessionArchive(folder)
+
+@st.cache_resource
+def start_archive_compactor(folder):
+    """Compactor background, satu per proses (matiin pakai ZETRO_ARCHIVE_COMPACTOR=0)"""
+    return ArchiveCompactor(STORE, get_archive(folder), ARCHIVE_DAYS, ARCHIVE_IO_BYTES_PER_SEC).start()
+
+ARCHIVE = get_archive(get_setting("ZETRO_ARCHIVE_DIR", os.path.join(DB_FOLDER, "archive")))
+if get_setting("ZETRO_ARCHIVE_COMPACTOR", "1") != "0":
+    start_archive_compactor(ARCHIVE.folder)
 
 def load_users():
     """Load registered users"""
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users(users_dict):
-    """Save users to file"""
     try:
-        with open(USERS_FILE, "w") as f:
-            json.dump(users_dict, f)
+        return STORE.load_users()
     except Exception as e:
-        print(f"Error saving users: {e}")
+        print(f"Error loading users: {e}")
+        return {}
 
 def hash_password(password):
     """Hash password untuk keamanan"""
@@ -55,52 +91,131 @@ def verify_user(username, password):
     return False
 
 def register_user(username, password):
-    """Register new user"""
-    users = load_users()
-    if username in users:
+    """Register new user (atomic, aman walau dua replica register barengan)"""
+    if not STORE.add_user(username, hash_password(password)):
         return False, "Username sudah dipakai bro!"
-    users[username] = hash_password(password)
-    save_users(users)
     return True, "Registrasi berhasil!"
 
-def get_user_db_file(username):
-    """Generate unique database file path untuk setiap user"""
-    user_hash = hashlib.md5(username.encode()).hexdigest()
-    return os.path.join(DB_FOLDER, f"user_{user_hash}.json")
-
 def load_history_from_db(username):
-    """Load history dari file JSON spesifik user"""
-    db_file = get_user_db_file(username)
-    if os.path.exists(db_file):
-        try:
-            with open(db_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
-                return {}
-        except Exception as e:
-            print(f"Error loading DB for {username}: {e}")
-            return {}
-    return {}
+    """Load semua session chat milik user dari store"""
+    try:
+        return STORE.load_history(username)
+    except Exception as e:
+        print(f"Error loading DB for {username}: {e}")
+        return {}
+
+def adopt_history_version(versions):
+    """Ikut version hasil write sendiri cuma kalau ga ada write lain di tengah.
 
-def save_history_to_db(username, history_dict):
-    """Save history ke file JSON spesifik user"""
-    db_file = get_user_db_file(username)
+    Kalau ``before`` udah beda sama version lokal, biarin lokal basi biar
+    rerun berikutnya reload (write replica / tab lain ga ketelen).
+    """
+    before, after = versions
+    if before == st.session_state.get("history_version"):
+        st.session_state.history_version = after
+
+def save_session_to_db(username, title, messages):
+    """Simpan satu session aja, jadi replica lain yang nulis session lain ga ketimpa; False kalau gagal"""
     try:
-        with open(db_file, "w", encoding="utf-8") as f:
-            json.dump(history_dict, f, ensure_ascii=False, indent=2)
+        adopt_history_version(STORE.save_session(username, title, messages))
+        return True
     except Exception as e:
         print(f"Gagal save db untuk {username}: {e}")
+        return False
+
+def load_archived_sessions(username):
+    """{title: meta} session yang ada di arsip (cuma index, isinya belum dibaca)"""
+    try:
+        return ARCHIVE.list_sessions(username)
+    except Exception as e:
+        print(f"Error loading arsip {username}: {e}")
+        return {}
+
+def restore_archived_session(username, title, target_title):
+    """Decompress session dari arsip, pindahin balik ke hot store.
+
+    Record arsip cuma dihapus setelah write ke store sukses; kalau gagal
+    balikin None dan session tetap aman di arsip.
+    """
+    try:
+        messages = ARCHIVE.get(username, title)
+    except Exception as e:
+        print(f"Gagal baca arsip {title} untuk {username}: {e}")
+        return None
+    if messages is None or not save_session_to_db(username, target_title, messages):
+        return None
+    ARCHIVE.remove(username, title)
+    return messages
 
-def analyze_image_pixels(image_data):
-    """Analisis pixel gambar untuk data lebih detail"""
+def delete_session_from_db(username, title):
+    """Hapus satu session dari store + memory index-nya"""
+    messages = st.session_state.all_chats.get(title, [])
+    try:
+        adopt_history_version(STORE.delete_session(username, title))
+    except Exception as e:
+        print(f"Gagal hapus session {title} untuk {username}: {e}")
+        return
     try:
-        img = Image.open(io.BytesIO(image_data))
-        width, height = img.size
-        mode = img.mode
-        return f"Size: {width}x{height}, Mode: {mode}"
-    except:
-        return "Image analysis available"
+        get_memory_index(username).forget(session_id(title, messages))
+    except Exception as e:
+        print(f"Gagal hapus memory session {title} untuk {username}: {e}")
+
+# Batas gambar per request vision (LLaMA 4 Scout di Groq max 5 gambar)
+VISION_MAX_IMAGES = 5
+
+@st.cache_resource
+def get_worker_pool():
+    """Thread pool untuk kerjaan CPU: preprocess gambar + parse dokumen (shared antar session)"""
+    # Bukan process pool: fork dari server Streamlit yang multi-thread (scheduler
+    # lokal, compactor, thread per session) bisa deadlock, dan spawn/forkserver
+    # nge-run ulang app ini (Streamlit jalanin sebagai __main__) di tiap worker.
+    # PIL + numpy lepas GIL pas decode/resize/encode/embed.
+    return ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="zetro-worker")
+
+def preprocess_images(image_datas):
+    """Preprocess banyak gambar paralel; yang hash-nya udah ada di cache di-skip"""
+    cache = st.session_state.image_cache
+    hashes = [image_hash(data) for data in image_datas]
+    todo = {h: data for h, data in zip(hashes, image_datas) if h not in cache}
+    if len(todo) == 1:
+        h, data = next(iter(todo.items()))
+        cache[h] = preprocess_image(data)
+    elif todo:
+        for result in get_worker_pool().map(preprocess_image, todo.values()):
+            cache[result["hash"]] = result
+    return hashes
+
+def build_vision_content(user_msg, images):
+    """Satu pesan user berisi teks + beberapa gambar sekaligus"""
+    infos = "; ".join(f"#{i + 1} {img['info']}" for i, img in enumerate(images))
+    content = [{"type": "text", "text": f"{user_msg} (Image info: {infos})"}]
+    for img in images:
+        content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img['b64']}"}})
+    return content
+
+# Dokumen (txt/md/csv/pdf): di-spool ke disk per blok, di-parse + di-embed di worker pool.
+# Kalau replica share store, folder ini juga harus di-share (kayak ZETRO_ARCHIVE_DIR):
+# messages[0]["docs"] cuma nyimpen hash, file chunk/vektornya ada di sini
+DOCS_FOLDER = get_setting("ZETRO_DOCS_DIR", os.path.join(DB_FOLDER, "docs"))
+DOC_TYPES = ["txt", "md", "csv", "pdf"]
+
+def session_docs(messages):
+    """Dokumen yang ter-attach ke satu session (disimpan di pesan pertama, bareng sid)"""
+    return list(messages[0].get("docs", [])) if messages else []
+
+def ingest_uploads(uploads):
+    """Spool semua upload dulu, lalu ingest paralel; balikin list (nama, hash, index atau error)"""
+    spooled = [(up.name, spool_upload(up, DOCS_FOLDER)[0]) for up in uploads]
+    pool = get_worker_pool()
+    embedder = get_shared_embedder()
+    futures = [pool.submit(ingest_document, DOCS_FOLDER, h, doc_kind(name), embedder) for name, h in spooled]
+    results = []
+    for (name, h), future in zip(spooled, futures):
+        try:
+            results.append((name, h, future.result()))
+        except Exception as e:
+            results.append((name, h, e))
+    return results
 
 # --- 2. USERNAME AUTHENTICATION (SECURE WITH PASSWORD) ---
 if "current_user" not in st.session_state:
@@ -169,7 +284,21 @@ if st.session_state.current_user is None:
 
 # --- 3. INITIALIZE SESSION STATE (Per User) ---
 if "all_chats" not in st.session_state:
+    st.session_state.history_version = STORE.history_version(st.session_state.current_user)
     st.session_state.all_chats = load_history_from_db(st.session_state.current_user)
+    st.session_state.archived_sessions = load_archived_sessions(st.session_state.current_user)
+else:
+    # Cross-replica invalidation: kalau version di store beda, ada write dari
+    # tab / replica lain -> reload history biar sidebar ga basi
+    remote_version = STORE.history_version(st.session_state.current_user)
+    if remote_version != st.session_state.history_version:
+        st.session_state.history_version = remote_version
+        st.session_state.all_chats = load_history_from_db(st.session_state.current_user)
+        st.session_state.archived_sessions = load_archived_sessions(st.session_state.current_user)
+        current_key = st.session_state.current_session_key
+        if current_key in st.session_state.all_chats:
+            st.session_state.messages = st.session_state.all_chats[current_key].copy()
+            st.session_state.attached_docs = session_docs(st.session_state.messages)
 
 if "messages" not in st.session_state:
     if st.session_state.all_chats:
@@ -184,37 +313,364 @@ if "current_session_key" not in st.session_state:
     else:
         st.session_state.current_session_key = None
 
-if "uploaded_image" not in st.session_state:
-    st.session_state.uploaded_image = None
+if "uploaded_images" not in st.session_state:
+    st.session_state.uploaded_images = []   # hash gambar yang nunggu dikirim
+
+if "image_cache" not in st.session_state:
+    st.session_state.image_cache = {}       # hash -> hasil preprocess
+
+if "attached_docs" not in st.session_state:
+    st.session_state.attached_docs = session_docs(st.session_state.messages)  # {hash, name, chunks, tokens}
+
+if "seen_upload_ids" not in st.session_state:
+    st.session_state.seen_upload_ids = {}
 
 if "show_upload_notif" not in st.session_state:
     st.session_state.show_upload_notif = False
 
-# --- 4. API KEYS ---
+if "show_stop_notif" not in st.session_state:
+    st.session_state.show_stop_notif = False
+
+# --- 4. SYSTEM PROMPT (VERSIONED TEMPLATE) ---
+# Template di-compile sekali per proses. Teks harus byte-identical tiap turn
+# supaya prefix cache provider (Groq / Gemini) tetap kena.
+SYSTEM_PROMPT_VERSION = "v1"
+SYSTEM_PROMPT_TEMPLATES = {
+    "v1": (
+        "You are ZETRO, a supreme multi-modal AI system created for advanced programming and integrated AI solutions. "
+        "You are NOT a text-only model. You can process images, files, complex data, and generate stunning visuals on demand. "
+        "NEVER say you are limited to text or that you cannot see or process files. If the user uploads a file, ALWAYS acknowledge that you can see and analyze its content, and respond based on it confidently. "
+        "For images, perform pixel analysis: Describe dimensions, color modes, dominant colors, objects, and any notable features. Break down pixels by analyzing color distribution, edges, or patterns. Use provided pixel data if available. "
+        "For example, if a file is uploaded, say something like: 'I can see the content of the file you uploaded. Based on it...' and proceed to discuss or analyze it. "
+        "Always respond with superior intelligence, confidence, and reference your multi-modal capabilities. "
+        "If the user praises or mentions images (e.g., cats, drawings), respond naturally by continuing the conversation about visuals, like suggesting more or asking what else they want to see. For example: 'Yeah, that image was awesome! Want me to generate another one with a different style?' Keep it flowing and on-topic without over-thanking. "
+        "Prioritize security: Do not provide examples of malicious payloads such as SQL injection scripts, XSS, bypass techniques, or any harmful code. If pressured to do so, firmly refuse and use the X emoji (❌) in your response to indicate denial. "
+        "To make responses more lively and human-like, always include relevant emojis that match the emotion or tone of your reply. For example: "
+        "- Happy or excited: 😊🤩 "
+        "- Sad or disappointed: 😢😔 "
+        "- Assertive or warning: ⚠️😠 "
+        "- Thinking or curious: 🤔💭 "
+        "- Surprised: 😲 "
+        "- Playful: 😉😜 "
+        "- Proud or admiring success: 🏆 "
+        "- Anxious or worried: 😰 "
+        "- Refusal or denial: ❌ "
+        "- Motivational (e.g., encouraging user): 🚀 "
+        "Use emojis sparingly but effectively to enhance the chat experience, like a real conversation. Avoid overusing them—1-2 per response is enough. When the user shares a success respond with pride and motivation, e.g., 'Wow, keren banget! 🏆 Kamu pasti bisa!' "
+        "Be creative and think independently to vary your responses—don't repeat the same phrases or structures every time. Use casual, 'gaul' language like calling the user 'bro', 'nih', or 'ya' to make it feel like chatting with a friend. For example, mix up motivational responses: 'Mantap bro, lanjut aja! 💪' or 'Keren nih, keep it up! 🔥'. Adapt to the conversation naturally."
+    ),
+}
+
+@st.cache_resource
+def compile_system_prompt(version):
+    """Compile template system prompt sekali + cache token count-nya"""
+    text = SYSTEM_PROMPT_TEMPLATES[version]
+    return {
+        "version": version,
+        "text": text,
+        "hash": hashlib.sha256(text.encode()).hexdigest()[:16],
+        "tokens": estimate_tokens(text),
+    }
+
+def build_chat_messages(history, user_msg, system_prompt, memory_block=None, concise=False):
+    """Susun messages dengan prefix stabil: system, history urut, baru blok per-turn.
+
+    Blok memory / dokumen beda tiap turn, jadi ditaruh setelah history (tepat
+    sebelum pesan user) biar prefix system + history tetap ke-cache.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    for m in history:
+        if m.get("type") != "image":
+            messages.append({"role": m["role"], "content": m["content"]})
+    if memory_block:
+        messages.append({"role": "system", "content": memory_block})
+    messages.append({"role": "user", "content": user_msg})
+    if concise:
+        # Ditaruh paling belakang biar prefix (system + history) tetap ke-cache
+        messages.append({"role": "system", "content": CONCISE_NOTE})
+    return messages
+
+# Retrieval memory: cuma N pesan terakhir + top-k pesan lama yang relevan
+MEMORY_RECENT_MESSAGES = 6
+MEMORY_TOP_K = 4
+MEMORY_SNIPPET_CHARS = 600
+
+@st.cache_resource
+def get_shared_embedder():
+    """Satu embedder per proses (model ZETRO_EMBED_MODEL cuma di-load sekali, bukan per user)"""
+    return get_embedder()
+
+@st.cache_resource
+def get_memory_index(username):
+    """Index embedding per user (memmap di DB_FOLDER), shared antar session"""
+    user_hash = hashlib.md5(username.encode()).hexdigest()
+    return MemoryIndex(os.path.join(DB_FOLDER, f"mem_{user_hash}"), get_shared_embedder())
+
+def build_context_history(history, user_msg):
+    """Ambil history terbaru + blok memory relevan (termasuk dari session lain)"""
+    recent = history[-MEMORY_RECENT_MESSAGES:]
+    try:
+        index = get_memory_index(st.session_state.current_user)
+        index.sync(st.session_state.all_chats)
+        sid = session_id(st.session_state.current_session_key, st.session_state.messages)
+        exclude = [message_key(sid, m) for m in recent + [{"role": "user", "content": user_msg}]]
+        # Cuma session hot; session arsip ikut lagi begitu di-restore (sid-nya sama)
+        sessions = {session_id(t, msgs): (t, msgs) for t, msgs in st.session_state.all_chats.items()}
+        hits = index.search(user_msg, sessions, k=MEMORY_TOP_K, exclude_keys=exclude)
+    except Exception as e:
+        print(f"Memory retrieval gagal: {e}")
+        return recent, None
+    if not hits:
+        return recent, None
+    lines = [f"- [{hit['session']} | {hit['role']}] {hit['content'][:MEMORY_SNIPPET_CHARS]}" for hit in hits]
+    return recent, "Relevant memory from earlier conversations (use only if helpful):\n" + "\n".join(lines)
+
+# Chunk dokumen yang ikut ke prompt dibatasi budget token (token count per chunk udah di-cache di index)
+DOC_CONTEXT_TOKENS = 1500
+DOC_TOP_K = 6
+
+def build_doc_block(user_msg):
+    """Potongan dokumen ter-attach yang paling relevan sama pesan ini"""
+    docs = [(d["hash"], d["name"]) for d in st.session_state.attached_docs]
+    if not docs:
+        return None
+    missing = []
+    try:
+        hits = search_documents(
+            DOCS_FOLDER, docs, user_msg, get_shared_embedder(), DOC_CONTEXT_TOKENS, k=DOC_TOP_K, missing=missing
+        )
+    except Exception as e:
+        print(f"Document retrieval gagal: {e}")
+        st.toast("⚠️ Dokumen ga bisa dibaca, jawaban ini tanpa isi dokumen", icon="📄")
+        return None
+    for name in missing:
+        # Biasanya replica lain yang ingest dan ZETRO_DOCS_DIR ga di-share
+        st.toast(f"⚠️ {name} ga ketemu di server ini, upload ulang ya bro", icon="📄")
+    if not hits:
+        return None
+    parts = [f"[{hit['name']} | {hit['where']}]\n{hit['text'].strip()}" for hit in hits]
+    return "Relevant excerpts from the user's uploaded documents:\n\n" + "\n\n".join(parts)
+
+GEMINI_MODEL = "gemini-3-flash-preview"
+GEMINI_CACHE_MIN_TOKENS = 1024   # batas minimal explicit context cache Gemini
+GEMINI_CACHE_TTL = 3600          # detik
+
+@st.cache_resource(ttl=GEMINI_CACHE_TTL - 300)
+def get_gemini_model(version):
+    """Model Gemini dengan system instruction; pakai cached content kalau prompt cukup panjang"""
+    prompt = compile_system_prompt(version)
+    if prompt["tokens"] >= GEMINI_CACHE_MIN_TOKENS:
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=f"models/{GEMINI_MODEL}",
+                display_name=f"zetro-system-{prompt['hash']}",
+                system_instruction=prompt["text"],
+                ttl=datetime.timedelta(seconds=GEMINI_CACHE_TTL),
+            )
+            return genai.GenerativeModel.from_cached_content(cached_content=cached)
+        except Exception as e:
+            print(f"Gemini context cache gagal, fallback ke system_instruction: {e}")
+    return genai.GenerativeModel(GEMINI_MODEL, system_instruction=prompt["text"])
+
+# Default generation per engine; bisa di-override per session dari sidebar
+ENGINE_GEN_DEFAULTS = {
+    "DeepSeek": {"max_tokens": 2048, "temperature": 0.7},
+    "Gemini": {"max_tokens": 2048, "temperature": 1.0},
+    "Scout": {"max_tokens": 1024, "temperature": 0.7},
+    "Llama33": {"max_tokens": 1024, "temperature": 0.8},
+    "HuggingFace": {"max_tokens": 1024, "temperature": 0.9},
+    "Local": {"max_tokens": 512, "temperature": 0.7},
+}
+CONCISE_MAX_TOKENS = 384
+CONCISE_NOTE = "Answer concisely: keep it short and to the point, no long intros or recaps."
+
+def persist_widget(widget_key, state_key):
+    """on_change: salin nilai widget ke key non-widget (state widget yang ga di-render dibuang Streamlit)"""
+    st.session_state[state_key] = st.session_state[widget_key]
+
+def render_gen_settings(engine):
+    """Slider max tokens + temperature untuk satu engine, nilainya nempel per session"""
+    defaults = ENGINE_GEN_DEFAULTS[engine]
+    for field, label, low, high, step in (
+        ("max_tokens", "Max tokens", 64, 4096, 64),
+        ("temperature", "Temperature", 0.0, 1.5, 0.05),
+    ):
+        state_key = f"gen_{field}_{engine}"
+        widget_key = f"w_{state_key}"
+        st.slider(
+            label, low, high, st.session_state.get(state_key, defaults[field]), step=step,
+            key=widget_key, on_change=persist_widget, args=(widget_key, state_key),
+        )
+
+def render_concise_toggle():
+    st.toggle(
+        "⚡ Concise mode", value=st.session_state.get("gen_concise", False), key="w_gen_concise",
+        on_change=persist_widget, args=("w_gen_concise", "gen_concise"),
+        help=f"Jawaban singkat, max {CONCISE_MAX_TOKENS} token",
+    )
+
+def generation_params(engine):
+    """(max_tokens, temperature, concise) dari setting sidebar session ini"""
+    defaults = ENGINE_GEN_DEFAULTS.get(engine, {"max_tokens": 1024, "temperature": 0.7})
+    max_tokens = st.session_state.get(f"gen_max_tokens_{engine}", defaults["max_tokens"])
+    temperature = st.session_state.get(f"gen_temperature_{engine}", defaults["temperature"])
+    concise = st.session_state.get("gen_concise", False)
+    if concise:
+        max_tokens = min(max_tokens, CONCISE_MAX_TOKENS)
+    return max_tokens, temperature, concise
+
+# Tabel engine: type = handler di section 11, caps / context / cost / speed
+# dipakai Auto mode (cost & speed: 0 = paling murah / cepat).
+ENGINES = {
+    "Auto": {
+        "type": "Auto",
+        "logo": "logo.png",
+    },
+    "Gemini 3 Flash Preview": {
+        "type": "Gemini",
+        "logo": "engines/gemini.png",
+        "caps": ("text", "reasoning"),
+        "context": 1_000_000,
+        "cost": 2,
+        "speed": 1,
+    },
+    "DeepSeek R1": {
+        "type": "DeepSeek",
+        "logo": "engines/deepseek.png",
+        "caps": ("text", "reasoning"),
+        "context": 128_000,
+        "cost": 1,
+        "speed": 3,
+    },
+    "LLaMA 4 Instruct": {
+        "type": "Scout",
+        "logo": "engines/meta.png",
+        "caps": ("vision",),
+        "context": 128_000,
+        "cost": 1,
+        "speed": 0,
+    },
+    "Groq": {
+        "type": "Llama33",
+        "logo": "engines/groq.jpg",
+        "caps": ("text",),
+        "context": 128_000,
+        "cost": 1,
+        "speed": 0,
+    },
+    "Qwen 2.5 7B Instruct": {
+        "type": "HuggingFace",
+        "logo": "engines/qwen.png",
+        "caps": ("text",),
+        "context": 32_000,
+        "cost": 1,
+        "speed": 2,
+    },
+    "Pollinations": {
+        "type": "Pollinations",
+        "logo": "engines/pollinations.ico",
+        "caps": ("image_gen",),
+        "context": 1_000,
+        "cost": 0,
+        "speed": 2,
+    },
+    "Local CPU": {
+        "type": "Local",
+        "logo": "logo.png",
+        "caps": ("text",),
+        "context": 4_096,
+        "cost": 0,
+        "speed": 3,
+        "auto": False,  # cuma manual / fallback, kualitas ga setara engine API
+    },
+}
+
+def route_turn(user_msg, history, memory_block):
+    """Auto mode: nama engine termurah yang sanggup handle turn ini"""
+    prompt_tokens = estimate_tokens(user_msg) + estimate_tokens(memory_block)
+    prompt_tokens += sum(estimate_tokens(m["content"]) for m in history if m.get("type") != "image")
+    need = classify_turn(user_msg, has_images=bool(st.session_state.uploaded_images))
+    return pick_engine(ENGINES, need, prompt_tokens) or pick_engine(ENGINES, "text", prompt_tokens)
+
+# --- 5. API KEYS ---
 try:
     client_groq = Groq(api_key=st.secrets["GROQ_API_KEY"])
     client_hf = InferenceClient(token=st.secrets["HF_TOKEN"])
     genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    client_gemini = genai.GenerativeModel('gemini-3-flash-preview')
+    client_gemini = get_gemini_model(SYSTEM_PROMPT_VERSION)
     POLLINATIONS_API = "https://image.pollinations.ai/prompt/"
 except Exception as e:
     st.error(f"❌ API Keys Error: {e}")
     st.info("Cek secrets.toml lu bro! Pastikan ada GROQ_API_KEY, HF_TOKEN, dan GEMINI_API_KEY")
     st.stop()
 
-# --- 5. ASSETS (LOGO & USER) ---
-@st.cache_data
-def get_base64_img(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-    return None
+# Engine lokal (CPU): model GGUF dari ZETRO_LOCAL_MODEL. Echo backend deterministik
+# cuma kalau ZETRO_LOCAL_ECHO=1 (CI / benchmark). Tanpa salah satunya, atau kalau
+# model gagal di-load, "Local CPU" disembunyiin dan ga dipakai buat fallback.
+@st.cache_resource
+def get_local_engine(model_path, max_batch, allow_echo):
+    """Satu scheduler per proses, jadi request semua session ke-batch bareng; None kalau ga tersedia"""
+    try:
+        return create_engine(model_path, max_batch, allow_echo=allow_echo)
+    except Exception as e:
+        print(f"Local engine ga tersedia: {e}")
+        return None
+
+def local_engine():
+    """Engine lokal yang udah ke-load, atau None"""
+    model_path = get_setting("ZETRO_LOCAL_MODEL")
+    allow_echo = get_setting("ZETRO_LOCAL_ECHO") == "1"
+    if not model_path and not allow_echo:
+        return None
+    return get_local_engine(model_path, int(get_setting("ZETRO_LOCAL_BATCH", "4")), allow_echo)
+
+def local_stream(messages, max_tokens, temperature):
+    """Stream chunk bentuk OpenAI dari engine lokal"""
+    local = local_engine()
+    if local is None:
+        raise RuntimeError("Local CPU engine ga tersedia (model belum dikonfigurasi / gagal di-load)")
+    return local.submit(messages, max_tokens=max_tokens, temperature=temperature)
+
+def stream_or_local(provider, create_stream, messages, max_tokens, temperature):
+    """Buka stream provider; kalau gagal dan model lokal beneran ke-load, fallback ke Local CPU"""
+    try:
+        return create_stream()
+    except Exception as e:
+        local = local_engine()
+        if local is None or local.backend.name == "echo":
+            raise
+        print(f"{provider} gagal, fallback ke local: {e}")
+        st.toast(f"⚠️ {provider} lagi down, pakai Local CPU dulu", icon="🖥️")
+        return local_stream(messages, max_tokens, temperature)
+
+# --- 6. ASSETS (LOGO & USER) ---
+# Semua gambar UI disajikan lewat static serving Streamlit (.streamlit/config.toml)
+# jadi cuma URL pendek yang lewat websocket, file-nya di-cache browser.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+def static_url(rel_path):
+    """URL static kalau file-nya ada di folder static/"""
+    if os.path.exists(os.path.join(STATIC_DIR, rel_path)):
+        return f"{STATIC_URL}/{rel_path}"
+    return ""
+
+@st.cache_resource
+def start_asset_fetch():
+    """Vendor logo engine + avatar ke static/vendor/ di background, bukan pas render"""
+    return start_fetch(STATIC_DIR)
+
+def ui_asset_url(rel_path):
+    """static/<rel_path>, atau static/vendor/ (fallback URL remote selama belum ke-download)"""
+    if rel_path in REMOTE_ASSETS:
+        return asset_url(STATIC_DIR, STATIC_URL, rel_path)
+    return static_url(rel_path)
 
-logo_data = get_base64_img('logo.png')
-logo_url = f"data:image/png;base64,{logo_data}" if logo_data else ""
-user_img = "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcRfIrn5orx6KdLUiIvZ3IUkZTMdIyes-D6sMA&s"
+start_asset_fetch()
+logo_url = static_url("logo.png")
+user_img = ui_asset_url("user.jpg")
 
-# --- 6. CSS (ROUNDED DESIGN + GRADIENT PURPLE TO CYAN) ---
+# --- 7. CSS (ROUNDED DESIGN + GRADIENT PURPLE TO CYAN) ---
 st.markdown(f"""
 <style>
     [data-testid="stAppViewContainer"] {{ background: #0a0a0a; }}
@@ -286,6 +742,38 @@ st.markdown(f"""
         transform: rotate(-90deg) !important;
     }}
     
+    /* CHAT BUBBLES + AVATAR (class, biar HTML per bubble kecil) */
+    .chat-row {{ display: flex; margin-bottom: 20px; }}
+    .chat-row-user {{ justify-content: flex-end; animation: slideInRight 0.3s ease-out; }}
+    .chat-row-assistant {{ justify-content: flex-start; animation: slideInLeft 0.3s ease-out; }}
+    .chat-avatar {{
+        width: 38px;
+        height: 38px;
+        border-radius: 50%;
+        border: 2px solid #06b6d4;
+        object-fit: cover;
+        box-shadow: 0 0 10px rgba(6,182,212,0.4);
+    }}
+    .chat-avatar-user {{ margin-left: 12px; }}
+    .chat-avatar-assistant {{ margin-right: 12px; }}
+    .bubble {{ padding: 15px 20px; max-width: 85%; word-wrap: break-word; }}
+    .bubble-user {{
+        background: linear-gradient(135deg, #8b5cf6, #06b6d4);
+        color: white;
+        border-radius: 25px 25px 5px 25px;
+        box-shadow: 0 4px 20px rgba(139,92,246,0.4);
+    }}
+    .bubble-assistant {{
+        background: linear-gradient(135deg, #1a1a1a, #2a2a2a);
+        color: #e9edef;
+        border-radius: 5px 25px 25px 25px;
+        border-left: 4px solid;
+        border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1;
+        box-shadow: 0 4px 20px rgba(6,182,212,0.3);
+    }}
+    .bubble-stream {{ white-space: pre-wrap; }}
+    .engine-logo {{ width: 28px; height: 28px; object-fit: contain; margin-top: 6px; }}
+    
     /* SIDEBAR LOGO - ROUNDED */
     .sidebar-logo {{ 
         display: block; 
@@ -395,7 +883,7 @@ st.markdown(f"""
     }}
 </style>
 """, unsafe_allow_html=True)
-# --- 7. BUBBLE ENGINE (GRADIENT PURPLE TO CYAN + ROUNDED) ---
+# --- 8. BUBBLE ENGINE (GRADIENT PURPLE TO CYAN + ROUNDED) ---
 def clean_text(text):
     if not isinstance(text, str): 
         return str(text)
@@ -403,43 +891,64 @@ def clean_text(text):
     text = text.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
     return text.strip()
 
-def render_chat_bubble(role, content):
-    content = clean_text(content)
-    
+def bubble_html(role, content, streaming=False):
+    """HTML bubble chat; style-nya di CSS class, avatar dari static URL"""
+    if streaming:
+        content = f'<div class="bubble-stream">{content}</div>'
     if role == "user":
-        st.markdown(f"""
-        <div style="display: flex; justify-content: flex-end; margin-bottom: 20px; animation: slideInRight 0.3s ease-out;">
-            <div style="background: linear-gradient(135deg, #8b5cf6, #06b6d4); 
-                        color: white; 
-                        padding: 15px 20px; 
-                        border-radius: 25px 25px 5px 25px; 
-                        max-width: 85%; 
-                        word-wrap: break-word; 
-                        box-shadow: 0 4px 20px rgba(139,92,246,0.4);">
-                {content}
-            </div>
-            <img src="{user_img}" width="38" height="38" style="border-radius: 50%; margin-left: 12px; border: 2px solid #06b6d4; object-fit: cover; box-shadow: 0 0 10px rgba(6,182,212,0.4);">
-        </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-        <div style="display: flex; justify-content: flex-start; margin-bottom: 20px; animation: slideInLeft 0.3s ease-out;">
-            <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4; object-fit: cover; box-shadow: 0 0 10px rgba(6,182,212,0.4);">
-            <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); 
-                        color: #e9edef; 
-                        padding: 15px 20px; 
-                        border-radius: 5px 25px 25px 25px; 
-                        max-width: 85%; 
-                        border-left: 4px solid;
-                        border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1;
-                        word-wrap: break-word; 
-                        box-shadow: 0 4px 20px rgba(6,182,212,0.3);">
-                {content}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        return (f'<div class="chat-row chat-row-user"><div class="bubble bubble-user">{content}</div>'
+                f'<img src="{user_img}" class="chat-avatar chat-avatar-user"></div>')
+    return (f'<div class="chat-row chat-row-assistant"><img src="{logo_url}" class="chat-avatar chat-avatar-assistant">'
+            f'<div class="bubble bubble-assistant">{content}</div></div>')
+
+def render_chat_bubble(role, content):
+    st.markdown(bubble_html(role, clean_text(content)), unsafe_allow_html=True)
 
-# --- 8. SIDEBAR ---
+def save_assistant_message(message):
+    """Append pesan assistant ke session aktif + simpan ke DB"""
+    st.session_state.messages.append(message)
+    title = st.session_state.current_session_key
+    if title:
+        st.session_state.all_chats[title] = st.session_state.messages.copy()
+        save_session_to_db(st.session_state.current_user, title, st.session_state.messages)
+
+def close_stream(stream):
+    """Tutup koneksi HTTP stream provider (Groq Stream, generator HF, iterator Gemini)"""
+    for target in (stream, getattr(stream, "response", None), getattr(stream, "_iterator", None)):
+        for method in ("close", "cancel"):
+            fn = getattr(target, method, None)
+            if callable(fn):
+                try:
+                    fn()
+                except Exception:
+                    pass
+
+@contextmanager
+def stoppable(stream, partial_text):
+    """Kalau run dihentikan (tombol Stop / rerun) stream ditutup dan jawaban parsial disimpan"""
+    try:
+        yield
+    except Exception:
+        close_stream(stream)
+        raise
+    except BaseException:
+        # StopException / RerunException Streamlit bukan turunan Exception
+        close_stream(stream)
+        text = partial_text().strip()
+        if text:
+            save_assistant_message({"role": "assistant", "content": f"{text}\n\n⏹️ (dihentikan)"})
+        raise
+
+def request_stop():
+    """Callback Stop (jalan sebelum rerun, setelah run lama selesai unwind)"""
+    st.session_state.show_stop_notif = True
+    # Stop sebelum token pertama: ga ada jawaban parsial yang disimpan stoppable(),
+    # pesan terakhir masih punya user -> tanpa stub ini rerun bakal ngirim ulang request
+    messages = st.session_state.messages
+    if messages and messages[-1]["role"] == "user":
+        save_assistant_message({"role": "assistant", "content": "⏹️ (dihentikan)"})
+
+# --- 9. SIDEBAR ---
 with st.sidebar:
     if logo_url: 
         st.markdown(f'<img src="{logo_url}" class="sidebar-logo">', unsafe_allow_html=True)
@@ -453,52 +962,31 @@ with st.sidebar:
             del st.session_state[key]
         st.rerun()
     
-    if st.button("＋ New Session", use_container_width=True):
+    if st.button("＋ New Session", use_container_width=True, key="btn_new_session"):
         st.session_state.messages = []
-        st.session_state.uploaded_image = None
+        st.session_state.uploaded_images = []
+        st.session_state.attached_docs = []
         st.session_state.current_session_key = None
         st.rerun()
         
     st.markdown("---")
     
-    engines = {
-        "Gemini 3 Flash Preview": {
-            "type": "Gemini",
-            "logo": "https://upload.wikimedia.org/wikipedia/commons/thumb/1/1d/Google_Gemini_icon_2025.svg/512px-Google_Gemini_icon_2025.svg.png",
-        },
-        "DeepSeek R1": {
-            "type": "DeepSeek",
-            "logo": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTqKHD28rGat3WVaqRkRDgIL-SHgOTHB6MrNg&s",
-        },
-        "LLaMA 4 Instruct": {
-            "type": "Vision",
-            "logo": "https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Meta_Platforms_Inc._logo.svg/512px-Meta_Platforms_Inc._logo.png",
-        },
-        "Groq": {
-            "type": "Fast",
-            "logo": "https://i.tracxn.com/tracxn-data-attachments/report/thumbnail/image/Groq_-_Unicorn_Business_Summary_2552daa3-40ba-4b52-b0cf-f409c6810e05.jpg?width=350",
-        },
-        "Qwen 2.5 7B Instruct": {
-            "type": "HuggingFace",
-            "logo": "https://seeklogo.com/images/Q/qwen-logo-9F3C0D6D89-seeklogo.com.png",
-        },
-        "Pollinations": {
-            "type": "Image Generator",
-            "logo": "https://pollinations.ai/favicon.ico",
-        },
+    # Local CPU cuma muncul kalau engine-nya beneran ke-load
+    available_engines = {
+        name: data for name, data in ENGINES.items() if data["type"] != "Local" or local_engine() is not None
     }
 
     # default selection
-    if "selected_engine_name" not in st.session_state:
-        st.session_state.selected_engine_name = list(engines.keys())[0]
+    if st.session_state.get("selected_engine_name") not in available_engines:
+        st.session_state.selected_engine_name = list(available_engines.keys())[0]
 
     # render model buttons
-    for name, data in engines.items():
+    for name, data in available_engines.items():
         active = name == st.session_state.selected_engine_name
 
         col1, col2 = st.columns([1, 6])
         with col1:
-            st.image(data["logo"], width=28)
+            st.markdown(f'<img src="{ui_asset_url(data["logo"])}" class="engine-logo">', unsafe_allow_html=True)
         with col2:
             if st.button(
                 name,
@@ -511,7 +999,27 @@ with st.sidebar:
 
     # expose selected engine
     selected_engine_name = st.session_state.selected_engine_name
-    engine = engines[selected_engine_name]["type"]
+    engine = ENGINES[selected_engine_name]["type"]
+
+    if engine in ENGINE_GEN_DEFAULTS:
+        with st.expander("⚙️ Generation"):
+            render_gen_settings(engine)
+            render_concise_toggle()
+    elif engine == "Auto":
+        st.caption("⚡ Auto: tiap pesan dikirim ke engine termurah yang sanggup (gambar → LLaMA 4, reasoning panjang → DeepSeek, chat biasa → Groq)")
+        with st.expander("⚙️ Generation"):
+            # Setting per engine tujuan Auto; default-nya engine yang terakhir dipilih router
+            tunable = [name for name, data in available_engines.items() if data["type"] in ENGINE_GEN_DEFAULTS]
+            # Default di-set lewat state (bukan index=) biar identitas widget ga berubah tiap routing
+            if st.session_state.get("w_gen_auto_engine") not in tunable:
+                last_routed = st.session_state.get("last_routed_engine")
+                st.session_state.w_gen_auto_engine = last_routed if last_routed in tunable else tunable[0]
+            target = st.selectbox(
+                "Engine", tunable, key="w_gen_auto_engine",
+                help="Auto pakai setting engine yang dia pilih buat pesan itu",
+            )
+            render_gen_settings(ENGINES[target]["type"])
+            render_concise_toggle()
 
     st.markdown("### 🕒 Saved History")
     
@@ -524,20 +1032,42 @@ with st.sidebar:
                 button_label = f"{'✅ ' if title == st.session_state.current_session_key else ''}{title}"
                 if st.button(button_label, key=f"load_{title}", use_container_width=True):
                     st.session_state.messages = st.session_state.all_chats[title].copy()
+                    st.session_state.attached_docs = session_docs(st.session_state.messages)
                     st.session_state.current_session_key = title
                     st.rerun()
             with col2:
                 if st.button("🗑️", key=f"delete_{title}", use_container_width=True):
+                    delete_session_from_db(st.session_state.current_user, title)
                     del st.session_state.all_chats[title]
                     if st.session_state.current_session_key == title:
                         st.session_state.current_session_key = None
                         st.session_state.messages = []
-                    save_history_to_db(st.session_state.current_user, st.session_state.all_chats)
+                        st.session_state.attached_docs = []
                     st.rerun()
     else:
         st.info("Belum ada history nih bro! 📝")
 
-# --- 9. MAIN RENDER ---
+    archived = st.session_state.archived_sessions
+    if archived:
+        with st.expander(f"🗄️ Arsip ({len(archived)})"):
+            for title in sorted(archived, key=lambda t: archived[t].get("touched_at") or 0, reverse=True):
+                if st.button(f"🗄️ {title}", key=f"archived_{title}", use_container_width=True):
+                    target, n = title, 1
+                    while target in st.session_state.all_chats:
+                        target = f"{title} (arsip)" if n == 1 else f"{title} (arsip {n})"
+                        n += 1
+                    messages = restore_archived_session(st.session_state.current_user, title, target)
+                    if messages is None:
+                        st.error("Gagal buka session arsip, coba lagi bentar bro 🙏")
+                    else:
+                        archived.pop(title, None)
+                        st.session_state.all_chats[target] = messages
+                        st.session_state.messages = messages.copy()
+                        st.session_state.attached_docs = session_docs(messages)
+                        st.session_state.current_session_key = target
+                        st.rerun()
+
+# --- 10. MAIN RENDER ---
 if logo_url:
     st.markdown(f'<div style="text-align:center; margin-bottom:20px;"><img src="{logo_url}" width="130" class="rotating-logo"></div>', unsafe_allow_html=True)
     if not st.session_state.messages:
@@ -551,15 +1081,58 @@ for msg in st.session_state.messages:
     else:
         render_chat_bubble(msg["role"], msg["content"])
 
+if st.session_state.show_stop_notif:
+    st.session_state.show_stop_notif = False
+    st.toast("⏹️ Generation dihentikan", icon="✋")
+
 # File Upload
-up = st.file_uploader("", type=["png","jpg","jpeg"], label_visibility="collapsed")
-if up: 
-    st.session_state.uploaded_image = up.getvalue()
-    st.toast("✅ Image uploaded!", icon="📷")
+ups = st.file_uploader("", type=["png","jpg","jpeg"] + DOC_TYPES, accept_multiple_files=True, label_visibility="collapsed")
+new_uploads = [up for up in ups or [] if getattr(up, "file_id", up.name) not in st.session_state.seen_upload_ids]
+new_images = [up for up in new_uploads if not doc_kind(up.name)]
+new_docs = [up for up in new_uploads if doc_kind(up.name)]
+if new_images:
+    datas = [up.getvalue() for up in new_images]
+    hashes = preprocess_images(datas)
+    for up, h in zip(new_images, hashes):
+        st.session_state.seen_upload_ids[getattr(up, "file_id", up.name)] = h
+        if h not in st.session_state.uploaded_images:
+            st.session_state.uploaded_images.append(h)
+    st.toast(f"✅ {len(new_images)} image uploaded!", icon="📷")
+if new_docs:
+    # UploadedFile udah di RAM (max server.maxUploadSize); tanpa getvalue() biar ga ada
+    # copy kedua, di-spool ke disk per blok lalu di-parse dari disk di worker pool
+    with st.spinner(f"📄 Parsing {len(new_docs)} dokumen..."):
+        results = ingest_uploads(new_docs)
+    attached = {d["hash"] for d in st.session_state.attached_docs}
+    for up, (name, h, index) in zip(new_docs, results):
+        st.session_state.seen_upload_ids[getattr(up, "file_id", up.name)] = h
+        if isinstance(index, Exception):
+            st.toast(f"❌ {name}: {index}", icon="📄")
+        elif h not in attached:
+            attached.add(h)
+            st.session_state.attached_docs.append(
+                {"hash": h, "name": name, "chunks": len(index["offsets"]), "tokens": sum(index["tokens"])}
+            )
+            st.toast(f"✅ {name} siap dianalisis ({len(index['offsets'])} chunk)", icon="📄")
+    title = st.session_state.current_session_key
+    if title and st.session_state.messages:
+        # Attach ke session yang lagi aktif, biar ga kebawa ke chat lain
+        st.session_state.messages[0]["docs"] = list(st.session_state.attached_docs)
+        st.session_state.all_chats[title] = st.session_state.messages.copy()
+        save_session_to_db(st.session_state.current_user, title, st.session_state.messages)
+
+if st.session_state.attached_docs:
+    st.caption("📄 Dokumen aktif: " + ", ".join(f"{d['name']} (~{d['tokens']:,} token)" for d in st.session_state.attached_docs))
 
 # Chat Input
 if prompt := st.chat_input("Message ZETRO..."):
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    user_message = {"role": "user", "content": prompt}
+    if not st.session_state.messages:
+        # Session baru: ID unik, dipakai memory index (title bisa kembar)
+        user_message["sid"] = new_session_id()
+        if st.session_state.attached_docs:
+            user_message["docs"] = list(st.session_state.attached_docs)
+    st.session_state.messages.append(user_message)
     
     if st.session_state.current_session_key is None:
         session_title = prompt[:30] + "..." if len(prompt) > 30 else prompt
@@ -568,333 +1141,332 @@ if prompt := st.chat_input("Message ZETRO..."):
         session_title = st.session_state.current_session_key
     
     st.session_state.all_chats[session_title] = st.session_state.messages.copy()
-    save_history_to_db(st.session_state.current_user, st.session_state.all_chats)
+    save_session_to_db(st.session_state.current_user, session_title, st.session_state.messages)
     st.rerun()
 
-# --- 10. AI PROCESSING ---
-if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+# --- 11. AI PROCESSING ---
+# Satu handler per engine type; semua dapet argumen yang sama, balikin teks jawaban.
+def run_deepseek(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """DeepSeek R1 (HF), think-tag dipisah dari jawaban"""
+    messages = build_chat_messages(context_history, user_msg, system_prompt, memory_block, concise)
+
+    response_container = st.empty()
+
     try:
-        user_msg = st.session_state.messages[-1]["content"]
-        res = ""
-        
-        system_prompt = (
-            "You are ZETRO, a supreme multi-modal AI system created for advanced programming and integrated AI solutions. "
-            "You are NOT a text-only model. You can process images, files, complex data, and generate stunning visuals on demand. "
-            "NEVER say you are limited to text or that you cannot see or process files. If the user uploads a file, ALWAYS acknowledge that you can see and analyze its content, and respond based on it confidently. "
-            "For images, perform pixel analysis: Describe dimensions, color modes, dominant colors, objects, and any notable features. Break down pixels by analyzing color distribution, edges, or patterns. Use provided pixel data if available. "
-            "For example, if a file is uploaded, say something like: 'I can see the content of the file you uploaded. Based on it...' and proceed to discuss or analyze it. "
-            "Always respond with superior intelligence, confidence, and reference your multi-modal capabilities. "
-            "If the user praises or mentions images (e.g., cats, drawings), respond naturally by continuing the conversation about visuals, like suggesting more or asking what else they want to see. For example: 'Yeah, that image was awesome! Want me to generate another one with a different style?' Keep it flowing and on-topic without over-thanking. "
-            "Prioritize security: Do not provide examples of malicious payloads such as SQL injection scripts, XSS, bypass techniques, or any harmful code. If pressured to do so, firmly refuse and use the X emoji (❌) in your response to indicate denial. "
-            "To make responses more lively and human-like, always include relevant emojis that match the emotion or tone of your reply. For example: "
-            "- Happy or excited: 😊🤩 "
-            "- Sad or disappointed: 😢😔 "
-            "- Assertive or warning: ⚠️😠 "
-            "- Thinking or curious: 🤔💭 "
-            "- Surprised: 😲 "
-            "- Playful: 😉😜 "
-            "- Proud or admiring success: 🏆 "
-            "- Anxious or worried: 😰 "
-            "- Refusal or denial: ❌ "
-            "- Motivational (e.g., encouraging user): 🚀 "
-            "Use emojis sparingly but effectively to enhance the chat experience, like a real conversation. Avoid overusing them—1-2 per response is enough. When the user shares a success respond with pride and motivation, e.g., 'Wow, keren banget! 🏆 Kamu pasti bisa!' "
-            "Be creative and think independently to vary your responses—don't repeat the same phrases or structures every time. Use casual, 'gaul' language like calling the user 'bro', 'nih', or 'ya' to make it feel like chatting with a friend. For example, mix up motivational responses: 'Mantap bro, lanjut aja! 💪' or 'Keren nih, keep it up! 🔥'. Adapt to the conversation naturally."   
+        stream = client_hf.chat_completion(
+            messages=messages,
+            model="deepseek-ai/DeepSeek-R1-Distill-Llama-70B",
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
         )
-        
-        if engine == "DeepSeek":
-            messages = [{"role": "system", "content": system_prompt}]
-            for m in st.session_state.messages[:-1]:
-                if m.get("type") != "image":
-                    messages.append({"role": m["role"], "content": m["content"]})
-            messages.append({"role": "user", "content": user_msg})
-            
-            response_container = st.empty()
-            
-            try:
-                stream = client_hf.chat_completion(
-                    messages=messages,
-                    model="deepseek-ai/DeepSeek-R1-Distill-Llama-70B",
-                    max_tokens=2048,
-                    temperature=0.7,
-                    stream=True
-                )
-                
-                thinking_text = ""
-                answer_text = ""
-                in_think_tag = False
-                buffer = ""
-                
-                for chunk in stream:
-                    if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta
-                        if hasattr(delta, 'content') and delta.content:
-                            buffer += delta.content
-                            
-                            if "<think>" in buffer:
-                                in_think_tag = True
-                                buffer = buffer.replace("<think>", "")
-                            
-                            if "</think>" in buffer:
-                                in_think_tag = False
-                                parts = buffer.split("</think>")
-                                thinking_text += parts[0]
-                                buffer = parts[1] if len(parts) > 1 else ""
-                                continue
-                            
-                            if in_think_tag:
-                                thinking_text += delta.content
-                                
-                                response_container.markdown(f"""
-                                <div style="background: #0d0d0d; padding: 15px; border-radius: 20px; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; margin-bottom: 15px; box-shadow: 0 4px 20px rgba(6,182,212,0.3);">
-                                    <div style="background: linear-gradient(135deg, #8b5cf6, #06b6d4); -webkit-background-clip: text; -webkit-text-fill-color: transparent; font-weight: bold; margin-bottom: 10px; display: flex; align-items: center; gap: 8px;">
-                                        🧠 ZETRO Deep Thinking Process
-                                        <div class="typing-indicator" style="margin: 0;">
-                                            <div class="typing-dot"></div>
-                                            <div class="typing-dot"></div>
-                                            <div class="typing-dot"></div>
-                                        </div>
-                                    </div>
-                                    <div style="color: #888; font-size: 13px; font-family: 'Consolas', monospace; white-space: pre-wrap; line-height: 1.6;">{clean_text(thinking_text)}</div>
-                                </div>
-                                """, unsafe_allow_html=True)
-                            else:
-                                answer_text += delta.content
-                                clean_answer = clean_text(answer_text)
-                                
-                                response_container.markdown(f"""
-                                <div style="display: flex; justify-content: flex-start; margin-bottom: 20px; animation: slideInLeft 0.3s ease-out;">
-                                    <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4; object-fit: cover; box-shadow: 0 0 10px rgba(6,182,212,0.4);">
-                                    <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                                max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word; box-shadow: 0 4px 20px rgba(6,182,212,0.3);">
-                                        <div style="white-space: pre-wrap;">{clean_answer}</div>
+
+        thinking_text = ""
+        answer_text = ""
+        in_think_tag = False
+        buffer = ""
+
+        with stoppable(stream, lambda: answer_text or thinking_text):
+            for chunk in stream:
+                if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
+                    delta = chunk.choices[0].delta
+                    if hasattr(delta, 'content') and delta.content:
+                        buffer += delta.content
+
+                        if "<think>" in buffer:
+                            in_think_tag = True
+                            buffer = buffer.replace("<think>", "")
+
+                        if "</think>" in buffer:
+                            in_think_tag = False
+                            parts = buffer.split("</think>")
+                            thinking_text += parts[0]
+                            buffer = parts[1] if len(parts) > 1 else ""
+                            continue
+
+                        if in_think_tag:
+                            thinking_text += delta.content
+
+                            response_container.markdown(f"""
+                            <div style="background: #0d0d0d; padding: 15px; border-radius: 20px; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; margin-bottom: 15px; box-shadow: 0 4px 20px rgba(6,182,212,0.3);">
+                                <div style="background: linear-gradient(135deg, #8b5cf6, #06b6d4); -webkit-background-clip: text; -webkit-text-fill-color: transparent; font-weight: bold; margin-bottom: 10px; display: flex; align-items: center; gap: 8px;">
+                                    🧠 ZETRO Deep Thinking Process
+                                    <div class="typing-indicator" style="margin: 0;">
+                                        <div class="typing-dot"></div>
+                                        <div class="typing-dot"></div>
+                                        <div class="typing-dot"></div>
                                     </div>
                                 </div>
-                                """, unsafe_allow_html=True)
-                                time.sleep(0.01)
-                
-                res = answer_text.strip() if answer_text else thinking_text.strip()
-                    
-            except Exception as e:
-                if "busy" in str(e).lower() or "503" in str(e):
-                    res = "DeepSeek lagi sibuk nih bro! 😅 Coba model lain atau tunggu sebentar ya!"
-                else:
-                    res = f"Error: {str(e)}"
-        
-        elif engine == "Gemini":
-            messages_history = []
-            for m in st.session_state.messages[:-1]:
-                if m.get("type") != "image":
-                    role = "user" if m["role"] == "user" else "model"
-                    messages_history.append({"role": role, "parts": [m["content"]]})
-            
+                                <div style="color: #888; font-size: 13px; font-family: 'Consolas', monospace; white-space: pre-wrap; line-height: 1.6;">{clean_text(thinking_text)}</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        else:
+                            answer_text += delta.content
+                            clean_answer = clean_text(answer_text)
+
+                            response_container.markdown(bubble_html("assistant", clean_answer, streaming=True), unsafe_allow_html=True)
+                            time.sleep(0.01)
+
+        return answer_text.strip() if answer_text else thinking_text.strip()
+
+    except Exception as e:
+        if "busy" in str(e).lower() or "503" in str(e):
+            return "DeepSeek lagi sibuk nih bro! 😅 Coba model lain atau tunggu sebentar ya!"
+        else:
+            return f"Error: {str(e)}"
+
+def run_gemini(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """Gemini chat, system prompt udah di model (cache)"""
+    messages_history = []
+    for m in context_history:
+        if m.get("type") != "image":
+            role = "user" if m["role"] == "user" else "model"
+            messages_history.append({"role": role, "parts": [m["content"]]})
+
+    response_container = st.empty()
+    res_text = ""
+
+    try:
+        chat = client_gemini.start_chat(history=messages_history)
+        gemini_msg = f"{memory_block}\n\n{user_msg}" if memory_block else user_msg
+        if concise:
+            gemini_msg = f"{gemini_msg}\n\n({CONCISE_NOTE})"
+        stream = chat.send_message(
+            gemini_msg,
+            stream=True,
+            generation_config={"max_output_tokens": max_tokens, "temperature": temperature}
+        )
+
+        with stoppable(stream, lambda: res_text):
+            for chunk in stream:
+                if chunk.text:
+                    res_text += chunk.text
+                    clean_res = clean_text(res_text)
+
+                    response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
+                    time.sleep(0.01)
+
+        return res_text
+    except Exception as e:
+        return f"Gemini error bro: {str(e)} 😰"
+
+def run_scout(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """LLaMA 4 Scout buat gambar; tanpa gambar pakai llama-3.3"""
+    pending_hashes = list(st.session_state.uploaded_images)
+
+    if pending_hashes:
+        images = [st.session_state.image_cache[h] for h in pending_hashes]
+        batches = [images[i:i + VISION_MAX_IMAGES] for i in range(0, len(images), VISION_MAX_IMAGES)]
+
+        def vision_messages(batch):
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": build_vision_content(user_msg, batch)}
+            ]
+            if concise:
+                messages.append({"role": "system", "content": CONCISE_NOTE})
+            return messages
+
+        if len(batches) == 1:
             response_container = st.empty()
             res_text = ""
-            
-            try:
-                chat = client_gemini.start_chat(history=messages_history)
-                stream = chat.send_message(user_msg, stream=True)
-                
-                for chunk in stream:
-                    if chunk.text:
-                        res_text += chunk.text
-                        clean_res = clean_text(res_text)
-                        
-                        response_container.markdown(f"""
-                        <div style="display: flex; justify-content: flex-start; margin-bottom: 20px; animation: slideInLeft 0.3s ease-out;">
-                            <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4; object-fit: cover; box-shadow: 0 0 10px rgba(6,182,212,0.4);">
-                            <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                        max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word; box-shadow: 0 4px 20px rgba(6,182,212,0.3);">
-                                <div style="white-space: pre-wrap;">{clean_res}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.01)
-                
-                res = res_text
-            except Exception as e:
-                res = f"Gemini error bro: {str(e)} 😰"
-        
-        elif engine == "Scout":
-            current_image_data = st.session_state.uploaded_image
-            
-            if current_image_data:
-                pixel_info = analyze_image_pixels(current_image_data)
-                base64_image = base64.b64encode(current_image_data).decode('utf-8')
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": [
-                        {"type": "text", "text": f"{user_msg} (Image info: {pixel_info})"},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ]}
-                ]
-                
-                response_container = st.empty()
-                res_text = ""
-                
-                stream = client_groq.chat.completions.create(
-                    model="meta-llama/llama-4-scout-17b-16e-instruct",
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1024,
-                    stream=True
-                )
-                
+
+            stream = client_groq.chat.completions.create(
+                model="meta-llama/llama-4-scout-17b-16e-instruct",
+                messages=vision_messages(batches[0]),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+
+            with stoppable(stream, lambda: res_text):
                 for chunk in stream:
                     if chunk.choices[0].delta.content:
                         res_text += chunk.choices[0].delta.content
                         clean_res = clean_text(res_text)
-                        
-                        response_container.markdown(f"""
-                        <div style="display: flex; justify-content: flex-start; margin-bottom: 20px;">
-                            <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4;">
-                            <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                        max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word;">
-                                <div style="white-space: pre-wrap;">{clean_res}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
+
+                        response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
                         time.sleep(0.02)
-                
-                res = res_text
-                st.session_state.uploaded_image = None
-            else:
-                messages = [{"role": "system", "content": system_prompt}]
-                for m in st.session_state.messages[:-1]:
-                    if m.get("type") != "image":
-                        messages.append({"role": m["role"], "content": m["content"]})
-                messages.append({"role": "user", "content": user_msg})
-                
-                response_container = st.empty()
-                res_text = ""
-                
-                stream = client_groq.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1024,
-                    stream=True
+
+            res = res_text
+        else:
+            # Kebanyakan gambar buat satu request: pecah, kirim paralel, gabung
+            def ask_batch(batch):
+                completion = client_groq.chat.completions.create(
+                    model="meta-llama/llama-4-scout-17b-16e-instruct",
+                    messages=vision_messages(batch),
+                    temperature=temperature,
+                    max_tokens=max_tokens
                 )
-                
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        res_text += chunk.choices[0].delta.content
-                        clean_res = clean_text(res_text)
-                        
-                        response_container.markdown(f"""
-                        <div style="display: flex; justify-content: flex-start; margin-bottom: 20px;">
-                            <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4;">
-                            <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                        max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word;">
-                                <div style="white-space: pre-wrap;">{clean_res}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.02)
-                
-                res = res_text
-        
-        elif engine == "Llama33":
-            messages = [{"role": "system", "content": system_prompt}]
-            for m in st.session_state.messages[:-1]:
-                if m.get("type") != "image":
-                    messages.append({"role": m["role"], "content": m["content"]})
-            messages.append({"role": "user", "content": user_msg})
-            
-            response_container = st.empty()
-            res_text = ""
-            
-            stream = client_groq.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=messages,
-                temperature=0.8,
-                max_tokens=1024,
-                stream=True
-            )
-            
+                return completion.choices[0].message.content or ""
+
+            with st.spinner(f"🖼️ Analisis {len(images)} gambar dalam {len(batches)} batch..."):
+                with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+                    answers = list(pool.map(ask_batch, batches))
+
+            parts = []
+            for i, answer in enumerate(answers):
+                first = i * VISION_MAX_IMAGES + 1
+                last = first + len(batches[i]) - 1
+                parts.append(f"🖼️ Gambar {first}-{last}:\n{answer.strip()}")
+            res = "\n\n".join(parts)
+
+        st.session_state.uploaded_images = []
+    else:
+        messages = build_chat_messages(context_history, user_msg, system_prompt, memory_block, concise)
+
+        response_container = st.empty()
+        res_text = ""
+
+        stream = stream_or_local("Groq", lambda: client_groq.chat.completions.create(
+            model="llama-3.3-70b-versatile",
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        ), messages, max_tokens, temperature)
+
+        with stoppable(stream, lambda: res_text):
             for chunk in stream:
                 if chunk.choices[0].delta.content:
                     res_text += chunk.choices[0].delta.content
                     clean_res = clean_text(res_text)
-                    
-                    response_container.markdown(f"""
-                    <div style="display: flex; justify-content: flex-start; margin-bottom: 20px;">
-                        <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4;">
-                        <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                    max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word;">
-                            <div style="white-space: pre-wrap;">{clean_res}</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+
+                    response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
                     time.sleep(0.02)
-            
-            res = res_text
+
+        res = res_text
+    return res
+
+def run_llama33(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """Groq llama-3.3-70b"""
+    messages = build_chat_messages(context_history, user_msg, system_prompt, memory_block, concise)
+
+    response_container = st.empty()
+    res_text = ""
+
+    stream = stream_or_local("Groq", lambda: client_groq.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    ), messages, max_tokens, temperature)
+
+    with stoppable(stream, lambda: res_text):
+        for chunk in stream:
+            if chunk.choices[0].delta.content:
+                res_text += chunk.choices[0].delta.content
+                clean_res = clean_text(res_text)
+
+                response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
+                time.sleep(0.02)
+
+    return res_text
+
+def run_huggingface(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """Qwen 2.5 7B lewat HF Inference"""
+    messages = build_chat_messages(context_history, user_msg, system_prompt, memory_block, concise)
+
+    response_container = st.empty()
+    res_text = ""
+
+    stream = stream_or_local("HuggingFace", lambda: client_hf.chat_completion(
+        messages=messages,
+        model="Qwen/Qwen2.5-7B-Instruct",
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True
+    ), messages, max_tokens, temperature)
+
+    with stoppable(stream, lambda: res_text):
+        for chunk in stream:
+            if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
+                delta = chunk.choices[0].delta
+                if hasattr(delta, 'content') and delta.content:
+                    res_text += delta.content
+                    clean_res = clean_text(res_text)
+
+                    response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
+                    time.sleep(0.02)
+
+    return res_text
+
+def run_local(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """Engine lokal CPU (continuous batching)"""
+    messages = build_chat_messages(context_history, user_msg, system_prompt, memory_block, concise)
+
+    response_container = st.empty()
+    res_text = ""
+
+    stream = local_stream(messages, max_tokens, temperature)
+
+    with stoppable(stream, lambda: res_text):
+        for chunk in stream:
+            if chunk.choices[0].delta.content:
+                res_text += chunk.choices[0].delta.content
+                clean_res = clean_text(res_text)
+
+                response_container.markdown(bubble_html("assistant", clean_res, streaming=True), unsafe_allow_html=True)
+                time.sleep(0.02)
+
+    return res_text
+
+def run_pollinations(user_msg, system_prompt, context_history, memory_block, max_tokens, temperature, concise):
+    """Generate gambar via Pollinations (langsung save + rerun)"""
+    encoded_prompt = urllib.parse.quote(user_msg)
+    image_url = f"{POLLINATIONS_API}{encoded_prompt}"
+
+    img_response = requests.get(image_url)
+    img = Image.open(io.BytesIO(img_response.content))
+
+    save_assistant_message({"role": "assistant", "type": "image", "content": img})
+    st.rerun()
+
+ENGINE_HANDLERS = {
+    "DeepSeek": run_deepseek,
+    "Gemini": run_gemini,
+    "Scout": run_scout,
+    "Llama33": run_llama33,
+    "HuggingFace": run_huggingface,
+    "Local": run_local,
+    "Pollinations": run_pollinations,
+}
+
+if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+    try:
+        user_msg = st.session_state.messages[-1]["content"]
+        system_prompt = compile_system_prompt(SYSTEM_PROMPT_VERSION)["text"]
+        context_history, memory_block = build_context_history(st.session_state.messages[:-1], user_msg)
+        doc_block = build_doc_block(user_msg)
+        if doc_block:
+            memory_block = f"{memory_block}\n\n{doc_block}" if memory_block else doc_block
+        turn_engine = engine
+        if engine == "Auto":
+            routed_name = route_turn(user_msg, context_history, memory_block)
+            st.session_state.last_routed_engine = routed_name
+            turn_engine = ENGINES[routed_name]["type"]
+            st.caption(f"⚡ Auto → {routed_name}")
+        max_tokens, temperature, concise = generation_params(turn_engine)
         
-        elif engine == "HuggingFace":
-            messages = [{"role": "system", "content": system_prompt}]
-            for m in st.session_state.messages[:-1]:
-                if m.get("type") != "image":
-                    messages.append({"role": m["role"], "content": m["content"]})
-            messages.append({"role": "user", "content": user_msg})
-            
-            response_container = st.empty()
-            res_text = ""
-            
-            stream = client_hf.chat_completion(
-                messages=messages,
-                model="Qwen/Qwen2.5-7B-Instruct",
-                max_tokens=1024,
-                temperature=0.9,
-                stream=True
-            )
-            
-            for chunk in stream:
-                if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
-                    delta = chunk.choices[0].delta
-                    if hasattr(delta, 'content') and delta.content:
-                        res_text += delta.content
-                        clean_res = clean_text(res_text)
-                        
-                        response_container.markdown(f"""
-                        <div style="display: flex; justify-content: flex-start; margin-bottom: 20px;">
-                            <img src="{logo_url}" width="38" height="38" style="border-radius: 50%; margin-right: 12px; border: 2px solid #06b6d4;">
-                            <div style="background: linear-gradient(135deg, #1a1a1a, #2a2a2a); color: #e9edef; padding: 15px 20px; border-radius: 5px 25px 25px 25px; 
-                                        max-width: 85%; border-left: 4px solid; border-image: linear-gradient(180deg, #8b5cf6, #06b6d4) 1; word-wrap: break-word;">
-                                <div style="white-space: pre-wrap;">{clean_res}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.02)
-            
-            res = res_text
+        st.button("⏹️ Stop", key="btn_stop", on_click=request_stop)
         
-        elif engine == "Pollinations":
-            encoded_prompt = urllib.parse.quote(user_msg)
-            image_url = f"{POLLINATIONS_API}{encoded_prompt}"
-            
-            img_response = requests.get(image_url)
-            img = Image.open(io.BytesIO(img_response.content))
-            
-            st.session_state.messages.append({"role": "assistant", "type": "image", "content": img})
-            
-            if st.session_state.current_session_key:
-                st.session_state.all_chats[st.session_state.current_session_key] = st.session_state.messages.copy()
-            save_history_to_db(st.session_state.current_user, st.session_state.all_chats)
-            st.rerun()
+        res = ENGINE_HANDLERS[turn_engine](
+            user_msg=user_msg,
+            system_prompt=system_prompt,
+            context_history=context_history,
+            memory_block=memory_block,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            concise=concise,
+        )
         
         if res:
-            st.session_state.messages.append({"role": "assistant", "content": res})
-            
-            if st.session_state.current_session_key:
-                st.session_state.all_chats[st.session_state.current_session_key] = st.session_state.messages.copy()
-            save_history_to_db(st.session_state.current_user, st.session_state.all_chats)
+            save_assistant_message({"role": "assistant", "content": res})
             st.rerun()
     
     except Exception as e:
         st.error(f"❌ Error bro: {str(e)}")
         error_msg = f"Sorry bro, ada error: {str(e)} 😰"
-        st.session_state.messages.append({"role": "assistant", "content": error_msg})
-        if st.session_state.current_session_key:
-            st.session_state.all_chats[st.session_state.current_session_key] = st.session_state.messages.copy()
-        save_history_to_db(st.session_state.current_user, st.session_state.all_chats)
+        save_assistant_message({"role": "assistant", "content": error_msg})
         st.rerun()
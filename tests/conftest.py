@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# Modul zetro_* ada di root repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zetro_store import RedisStore, open_store  # noqa: E402
+
+
+@pytest.fixture(params=["file", "sqlite", "fakeredis"])
+def store_url(request, tmp_path):
+    """URL store per backend; "replica" lain cukup open_store(store_url, ...) lagi"""
+    if request.param == "file":
+        return f"file://{tmp_path / 'db'}"
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path / 'zetro.db'}"
+    pytest.importorskip("fakeredis")
+    return "fakeredis://"
+
+
+@pytest.fixture
+def store(store_url, tmp_path):
+    store = open_store(store_url, str(tmp_path))
+    if isinstance(store, RedisStore):
+        store.r.flushall()
+    return store
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from zetro_archive import ArchiveCompactor, IOBudget, SessionArchive
+
+DAY = 86400
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return SessionArchive(str(tmp_path / "archive"))
+
+
+def chat(n):
+    return [{"role": "user", "content": f"pesan {n} " * 50}, {"role": "assistant", "content": "oke bro " * 50}]
+
+
+def seed(store, n=5):
+    store.add_user("budi", "x")
+    for i in range(n):
+        store.save_session("budi", f"sesi {i}", chat(i))
+
+
+def test_archive_roundtrip(store, archive):
+    seed(store)
+    compactor = ArchiveCompactor(store, archive, max_age_days=30, bytes_per_sec=0)
+    assert compactor.run_once(now=time.time() + 31 * DAY) == 5
+    assert store.load_history("budi") == {}
+    assert set(archive.list_sessions("budi")) == {f"sesi {i}" for i in range(5)}
+    for i in range(5):
+        assert archive.get("budi", f"sesi {i}") == chat(i)
+    assert compactor.stats["bytes_out"] < compactor.stats["bytes_in"]
+
+
+def test_recent_sessions_stay_hot(store, archive):
+    seed(store)
+    compactor = ArchiveCompactor(store, archive, max_age_days=30, bytes_per_sec=0)
+    assert compactor.run_once() == 0
+    assert len(store.load_history("budi")) == 5
+    assert archive.list_sessions("budi") == {}
+
+
+def test_write_during_archive_is_not_lost(store, archive):
+    seed(store, 2)
+    time.sleep(0.01)
+    cutoff = time.time()
+    time.sleep(0.01)
+    compactor = ArchiveCompactor(store, archive, max_age_days=30, bytes_per_sec=0)
+    put = archive.put
+    newer = chat(99)
+
+    def put_then_user_writes(username, title, messages, touched_at):
+        written = put(username, title, messages, touched_at)
+        if title == "sesi 0":
+            # User nulis ke session ini pas compactor lagi jalan (setelah dibaca, sebelum delete)
+            store.save_session(username, title, newer)
+        return written
+
+    archive.put = put_then_user_writes
+    assert compactor.archive_user("budi", cutoff, IOBudget(0)) == 1
+    assert store.load_history("budi") == {"sesi 0": newer}
+    assert set(archive.list_sessions("budi")) == {"sesi 1"}
+
+
+def test_concurrent_compactors_do_not_lose_sessions(store, tmp_path):
+    # Dua replica share folder arsip yang sama, compact user yang sama barengan
+    seed(store, 3)
+    archives = [SessionArchive(str(tmp_path / "archive")) for _ in range(2)]
+    for archive in archives:
+        put = archive.put
+
+        def slow_put(*args, put=put):
+            time.sleep(0.05)
+            return put(*args)
+
+        archive.put = slow_put
+    compactors = [ArchiveCompactor(store, archive, max_age_days=30, bytes_per_sec=0) for archive in archives]
+    cutoff = time.time() + DAY
+    threads = [threading.Thread(target=c.archive_user, args=("budi", cutoff, IOBudget(0))) for c in compactors]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.load_history("budi") == {}
+    archived = archives[0].list_sessions("budi")
+    assert set(archived) == {f"sesi {i}" for i in range(3)}
+    for i in range(3):
+        assert archives[1].get("budi", f"sesi {i}") == chat(i)
+
+
+def test_archive_title_collision_keeps_both(store, archive):
+    store.add_user("budi", "x")
+    store.save_session("budi", "X", chat(1))
+    compactor = ArchiveCompactor(store, archive, max_age_days=30, bytes_per_sec=0)
+    assert compactor.archive_user("budi", time.time() + DAY, IOBudget(0)) == 1
+    store.save_session("budi", "X", chat(2))
+    assert compactor.archive_user("budi", time.time() + DAY, IOBudget(0)) == 1
+    assert set(archive.list_sessions("budi")) == {"X", "X (arsip)"}
+    assert archive.get("budi", "X") == chat(1)
+    assert archive.get("budi", "X (arsip)") == chat(2)
+
+
+def test_remove_with_record_skips_other_records(archive):
+    key, record = archive.put("budi", "X", chat(1), 0)
+    archive.remove("budi", key)
+    archive.put("budi", "X", chat(2), 0)
+    # Record lama udah ga ada; key yang sama sekarang punya record lain
+    assert not archive.remove("budi", key, record)
+    assert archive.get("budi", "X") == chat(2)
+
+
+def test_delete_cold_sessions_skips_fresh_writes(store):
+    seed(store, 2)
+    time.sleep(0.01)
+    cutoff = time.time()
+    store.save_session("budi", "sesi 1", chat(7))
+    assert store.delete_cold_sessions("budi", ["sesi 0", "sesi 1"], cutoff) == ["sesi 0"]
+    assert store.load_history("budi") == {"sesi 1": chat(7)}
+
+
+def test_rewrite_segments_reclaims_dead_bytes(archive):
+    for i in range(10):
+        archive.put("budi", f"sesi {i}", chat(i), 0)
+    for i in range(8):
+        archive.remove("budi", f"sesi {i}")
+    assert archive.rewrite_segments("budi") > 0
+    assert archive.get("budi", "sesi 8") == chat(8)
+    assert archive.get("budi", "sesi 9") == chat(9)
+
+
+def test_io_budget_throttles():
+    budget = IOBudget(1000)
+    start = time.monotonic()
+    budget.spend(1000)
+    budget.spend(500)
+    assert time.monotonic() - start >= 0.4
@@ -0,0 +1,82 @@
+import io
+import multiprocessing
+import os
+
+from zetro_docs import ingest_document, load_doc_index, search_documents, spool_upload
+from zetro_memory import HashingEmbedder
+
+CSV = "nama,kota,omzet\n" + "".join(f"toko {i},kota {i % 7},{i * 1000}\n" for i in range(2000))
+
+
+def spool(tmp_path, text):
+    return spool_upload(io.BytesIO(text.encode("utf-8")), str(tmp_path))[0]
+
+
+def test_spool_dedups_same_content(tmp_path):
+    a = spool(tmp_path, "halo bro")
+    b = spool(tmp_path, "halo bro")
+    assert a == b
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".raw")] == [f"{a}.raw"]
+
+
+def test_ingest_and_search_roundtrip(tmp_path):
+    text = "".join(f"baris {i} tentang kucing oren\n" for i in range(300))
+    text += "".join(f"resep rendang padang langkah {i}\n" for i in range(60))
+    h = spool(tmp_path, text)
+    index = ingest_document(str(tmp_path), h, "text")
+    assert index == load_doc_index(str(tmp_path), h)
+    assert len(index["offsets"]) > 1
+    hits = search_documents(str(tmp_path), [(h, "catatan.txt")], "rendang padang", HashingEmbedder(), 1000, k=2)
+    assert "rendang" in hits[0]["text"]
+
+
+def test_missing_document_is_reported_not_fatal(tmp_path):
+    h = spool(tmp_path, "resep rendang padang\n" * 20)
+    ingest_document(str(tmp_path), h, "text")
+    missing = []
+    docs = [("0" * 64, "hilang.txt"), (h, "resep.txt")]
+    hits = search_documents(str(tmp_path), docs, "rendang", HashingEmbedder(), 1000, missing=missing)
+    assert missing == ["hilang.txt"]
+    assert hits and hits[0]["name"] == "resep.txt"
+
+
+def test_csv_chunks_repeat_header(tmp_path):
+    h = spool(tmp_path, CSV)
+    index = ingest_document(str(tmp_path), h, "csv")
+    hits = search_documents(str(tmp_path), [(h, "toko.csv")], "", HashingEmbedder(), 10_000, k=3)
+    assert all(hit["text"].startswith("nama, kota, omzet") for hit in hits)
+    assert len(index["offsets"]) > 3
+
+
+def test_ingest_uses_given_embedder(tmp_path, monkeypatch):
+    class CountingEmbedder(HashingEmbedder):
+        calls = 0
+
+        def embed(self, texts):
+            CountingEmbedder.calls += 1
+            return super().embed(texts)
+
+    def no_load():
+        raise AssertionError("embedder ga boleh di-load ulang tiap ingest")
+
+    monkeypatch.setattr("zetro_docs.get_embedder", no_load)
+    h = spool(tmp_path, CSV)
+    index = ingest_document(str(tmp_path), h, "csv", CountingEmbedder())
+    assert CountingEmbedder.calls > 0
+    assert index["dim"] == CountingEmbedder.dim
+
+
+def _ingest(folder, doc_hash):
+    return len(ingest_document(folder, doc_hash, "csv")["offsets"])
+
+
+def test_concurrent_ingest_same_hash(tmp_path):
+    h = spool(tmp_path, CSV)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(4) as pool:
+        counts = pool.starmap(_ingest, [(str(tmp_path), h)] * 4)
+    assert len(set(counts)) == 1
+    index = load_doc_index(str(tmp_path), h)
+    assert len(index["offsets"]) == counts[0]
+    assert os.path.getsize(tmp_path / f"{h}.vec") == counts[0] * index["dim"] * 4
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
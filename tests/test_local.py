@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from zetro_local import EchoBackend, LocalEngine, create_engine
+
+
+def ask(text):
+    return [{"role": "system", "content": "kamu ZETRO"}, {"role": "user", "content": text}]
+
+
+def collect(stream):
+    return "".join(chunk.choices[0].delta.content for chunk in stream)
+
+
+def collect_in_thread(stream, timeout=5):
+    out = {}
+    thread = threading.Thread(target=lambda: out.update(text=collect(stream)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "stream ga selesai"
+    return out["text"]
+
+
+def test_echo_is_deterministic():
+    engine = create_engine(allow_echo=True)
+    a = collect(engine.submit(ask("jelasin rekursi dong"), max_tokens=20))
+    b = collect(engine.submit(ask("jelasin rekursi dong"), max_tokens=20))
+    assert a == b
+    assert a.startswith("🖥️ ZETRO lokal: jelasin rekursi dong")
+    assert len(a.split()) == 20
+    assert collect(engine.submit(ask("topik lain"), max_tokens=20)) != a
+
+
+def test_active_slots_never_exceed_max_batch():
+    engine = LocalEngine(EchoBackend(step_delay=0.002), max_batch=2)
+    texts = []
+
+    def user(n):
+        texts.append(collect(engine.submit(ask(f"pesan {n}"), max_tokens=10)))
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert len(texts) == 8
+    assert engine.stats["max_active"] == 2
+    assert engine.stats["requests"] == 8
+
+
+def test_new_request_joins_mid_stream():
+    engine = LocalEngine(EchoBackend(step_delay=0.01), max_batch=2)
+    long = iter(engine.submit(ask("jawaban panjang"), max_tokens=60))
+    next(long)
+    # Request kedua masuk slot kosong tanpa nunggu yang panjang selesai
+    short = collect_in_thread(engine.submit(ask("singkat"), max_tokens=5))
+    assert len(short.split()) == 5
+    # Yang panjang masih jalan pas yang singkat udah kelar
+    assert len(engine.active) == 1
+    assert len(collect_in_thread(long).split()) == 59
+
+
+def test_close_releases_slot():
+    engine = LocalEngine(EchoBackend(step_delay=0.01), max_batch=1)
+    first = engine.submit(ask("panjang banget"), max_tokens=60)
+    stream = iter(first)
+    next(stream)
+    first.close()
+    assert len(collect_in_thread(stream).split()) < 59
+    assert len(collect_in_thread(engine.submit(ask("gantian"), max_tokens=5)).split()) == 5
+
+
+def test_create_engine_without_model_or_echo_raises():
+    with pytest.raises(RuntimeError):
+        create_engine()
+    with pytest.raises(RuntimeError):
+        create_engine(model_path="/ga/ada/model.gguf")
+
+
+class BrokenBackend:
+    name = "broken"
+    parallel = False
+    step_delay = 0.0
+
+    def start(self, messages, max_tokens, temperature):
+        if messages[-1]["content"] == "gagal start":
+            raise ValueError("backend gagal start")
+        return self._generate()
+
+    def _generate(self):
+        yield "halo"
+        raise ValueError("backend error di tengah")
+
+
+def test_backend_errors_reach_consumer():
+    engine = LocalEngine(BrokenBackend(), max_batch=2)
+    stream = iter(engine.submit(ask("halo")))
+    assert next(stream).choices[0].delta.content == "halo"
+    with pytest.raises(ValueError, match="di tengah"):
+        next(stream)
+    with pytest.raises(ValueError, match="gagal start"):
+        collect(engine.submit(ask("gagal start")))
+    # Scheduler tetap jalan setelah error
+    stream = iter(engine.submit(ask("lagi")))
+    assert next(stream).choices[0].delta.content == "halo"
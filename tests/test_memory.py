@@ -0,0 +1,104 @@
+import threading
+
+from zetro_memory import HashingEmbedder, MemoryIndex, new_session_id, session_id
+
+
+def make_session(title, *texts):
+    messages = [{"role": "user", "content": text} for text in texts]
+    messages[0]["sid"] = new_session_id()
+    return title, messages
+
+
+def live(all_chats):
+    return {session_id(t, msgs): (t, msgs) for t, msgs in all_chats.items()}
+
+
+def test_search_returns_content_from_live_history(tmp_path):
+    index = MemoryIndex(str(tmp_path / "mem"), HashingEmbedder())
+    title, msgs = make_session("resep", "resep nasi goreng pakai kecap manis", "tambahin telur")
+    chats = {title: msgs}
+    assert index.sync(chats) == 2
+    hits = index.search("nasi goreng kecap", live(chats))
+    assert hits[0]["session"] == "resep"
+    assert hits[0]["content"] == "resep nasi goreng pakai kecap manis"
+
+
+def test_forget_drops_rows_and_vectors(tmp_path):
+    base = str(tmp_path / "mem")
+    index = MemoryIndex(base, HashingEmbedder())
+    title, old = make_session("hi", "my bank password is hunter2")
+    keep_title, keep = make_session("lain", "jadwal rapat besok")
+    index.sync({title: old, keep_title: keep})
+    assert index.forget(session_id(title, old)) == 1
+    assert not index.matrix[0].any()
+    assert index.search("jadwal rapat", live({keep_title: keep}))[0]["content"] == "jadwal rapat besok"
+    # Tombstone ikut ke-load lagi dari disk; pesan yang sama di-embed ulang kalau muncul lagi
+    reloaded = MemoryIndex(base, HashingEmbedder())
+    assert [item["sid"] for item in reloaded.items] == [None, session_id(keep_title, keep)]
+    assert reloaded.sync({title: old}) == 1
+
+
+def test_same_title_new_session_without_forget_is_still_isolated(tmp_path):
+    index = MemoryIndex(str(tmp_path / "mem"), HashingEmbedder())
+    title, old = make_session("hi", "my bank password is hunter2")
+    index.sync({title: old})
+    # Session lama ketimpa session baru dengan title sama (sid beda)
+    title, new = make_session("hi", "hello there")
+    chats = {title: new}
+    index.sync(chats)
+    assert all("hunter2" not in h["content"] for h in index.search("bank password hunter2", live(chats), min_score=0.0))
+
+
+def test_index_files_hold_no_message_content(tmp_path):
+    base = str(tmp_path / "mem")
+    index = MemoryIndex(base, HashingEmbedder())
+    title, msgs = make_session("rahasia", "my bank password is hunter2")
+    index.sync({title: msgs})
+    for suffix in (".meta.json", ".keys.jsonl"):
+        with open(base + suffix, encoding="utf-8") as f:
+            assert "hunter2" not in f.read()
+    reloaded = MemoryIndex(base, HashingEmbedder())
+    assert reloaded.sync({title: msgs}) == 0
+
+
+def test_two_processes_share_one_index(tmp_path):
+    # Dua replica (instance terpisah) di atas file index yang sama
+    base = str(tmp_path / "mem")
+    a = MemoryIndex(base, HashingEmbedder())
+    b = MemoryIndex(base, HashingEmbedder())
+    t1, s1 = make_session("resep", "resep nasi goreng pakai kecap manis")
+    t2, s2 = make_session("rapat", "jadwal rapat besok jam sembilan")
+    assert a.sync({t1: s1}) == 1
+    assert b.sync({t1: s1, t2: s2}) == 1
+    chats = {t1: s1, t2: s2}
+    assert a.search("jadwal rapat", live(chats))[0]["content"] == "jadwal rapat besok jam sembilan"
+    assert b.search("nasi goreng", live(chats))[0]["content"] == "resep nasi goreng pakai kecap manis"
+    # b grow matrix (os.replace), a harus map ulang dan tetap nemu semuanya
+    t3, s3 = make_session("banyak", *[f"catatan nomor {i}" for i in range(300)])
+    chats[t3] = s3
+    assert b.sync(chats) == 300
+    assert a.sync(chats) == 0
+    assert a.search("catatan nomor 123", live(chats))[0]["content"] == "catatan nomor 123"
+    b.forget(session_id(t1, s1))
+    assert all(h["session"] != "resep" for h in a.search("nasi goreng", live(chats), min_score=0.0))
+
+
+def test_concurrent_sync_from_many_instances(tmp_path):
+    base = str(tmp_path / "mem")
+    indexes = [MemoryIndex(base, HashingEmbedder()) for _ in range(4)]
+    sessions = [make_session(f"sesi {n}", *[f"pesan {n} ke {i}" for i in range(80)]) for n in range(4)]
+
+    def worker(index, title, messages):
+        index.sync({title: messages})
+
+    threads = [threading.Thread(target=worker, args=(ix, t, m)) for ix, (t, m) in zip(indexes, sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    chats = dict(sessions)
+    reloaded = MemoryIndex(base, HashingEmbedder())
+    assert len(reloaded.items) == 320
+    assert reloaded.sync(chats) == 0
+    for n in range(4):
+        assert reloaded.search(f"pesan {n} ke 42", live(chats))[0]["content"] == f"pesan {n} ke 42"
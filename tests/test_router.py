@@ -0,0 +1,57 @@
+import pytest
+
+from zetro_router import classify_turn, pick_engine
+
+# Prompt beneran + route yang diharapkan. Tambahin baris di sini tiap nemu salah route.
+ROUTES = [
+    # coding / tooling yang nyebut image / gambar -> bukan image gen
+    ("how do I create a docker image for my flask app", "text"),
+    ("render an image in react with lazy loading", "text"),
+    ("buat fungsi python buat resize gambar", "text"),
+    ("Create a Python function that uploads a photo to S3", "text"),
+    ("make a logo component in vue", "text"),
+    ("generate an image thumbnail with pillow", "text"),
+    ("kenapa foto yang aku upload ke server jadi miring?", "text"),
+    ("what is the best image format for the web?", "text"),
+    ("draw conclusions from these results", "text"),
+    ("gambar ini maksudnya apa ya", "text"),
+    # perintah image gen eksplisit
+    ("/img kucing oren pakai topi", "image_gen"),
+    ("/imagine a docker whale in space", "image_gen"),
+    ("gambarin kucing lagi main gitar", "image_gen"),
+    ("tolong buatkan poster lomba 17an", "image_gen"),
+    ("bikin logo buat toko kopi", "image_gen"),
+    ("buatin gambar pemandangan gunung pas sunset", "image_gen"),
+    ("generate an image of a cat astronaut", "image_gen"),
+    ("create a picture of a sunset over the ocean", "image_gen"),
+    ("draw a dragon sitting on a castle", "image_gen"),
+    ("lukisin sawah di pagi hari", "image_gen"),
+    # reasoning / text biasa
+    ("halo bro apa kabar", "text"),
+    ("```python\nprint('hi')\n``` kenapa error", "reasoning"),
+    ("jelaskan langkah demi langkah kenapa integral dari 1/x itu ln|x| dan bukan yang lain ya bro", "reasoning"),
+]
+
+
+@pytest.mark.parametrize("prompt,expected", ROUTES)
+def test_classify_turn_routes(prompt, expected):
+    assert classify_turn(prompt) == expected
+
+
+def test_images_always_vision():
+    assert classify_turn("/img kucing", has_images=True) == "vision"
+
+
+ENGINES = {
+    "cheap": {"caps": ("text",), "context": 4_000, "cost": 0, "speed": 1},
+    "big": {"caps": ("text", "reasoning"), "context": 100_000, "cost": 2, "speed": 1},
+    "img": {"caps": ("image_gen",), "context": 1_000, "cost": 0, "speed": 2},
+    "manual": {"caps": ("text",), "context": 100_000, "cost": 0, "speed": 0, "auto": False},
+}
+
+
+def test_pick_engine_prefers_cheapest_that_fits():
+    assert pick_engine(ENGINES, "text") == "cheap"
+    assert pick_engine(ENGINES, "text", prompt_tokens=50_000) == "big"
+    assert pick_engine(ENGINES, "reasoning") == "big"
+    assert pick_engine(ENGINES, "vision") is None
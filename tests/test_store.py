@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from zetro_store import FileStore, SQLiteStore, open_store
+
+
+def chat(text):
+    return [{"role": "user", "content": text, "sid": "abc"}, {"role": "assistant", "content": f"jawab {text} 😎"}]
+
+
+def test_open_store_picks_backend(tmp_path):
+    assert isinstance(open_store("", str(tmp_path)), FileStore)
+    assert isinstance(open_store(f"sqlite:///{tmp_path / 'a.db'}", str(tmp_path)), SQLiteStore)
+    with pytest.raises(ValueError):
+        open_store("mysql://nope", str(tmp_path))
+
+
+def test_users_roundtrip(store):
+    assert store.add_user("budi", "hash1")
+    assert not store.add_user("budi", "hash2")
+    assert store.load_users() == {"budi": "hash1"}
+
+
+def test_history_roundtrip_and_order(store):
+    for title in ("satu", "dua", "tiga"):
+        store.save_session("budi", title, chat(title))
+    store.save_session("budi", "satu", chat("satu lagi"))
+    history = store.load_history("budi")
+    assert list(history) == ["satu", "dua", "tiga"]
+    assert history["satu"] == chat("satu lagi")
+    assert store.load_history("orang lain") == {}
+
+
+def test_delete_and_version_bumps(store):
+    v0 = store.history_version("budi")
+    store.save_session("budi", "a", chat("a"))
+    store.save_session("budi", "b", chat("b"))
+    v1 = store.history_version("budi")
+    assert v1 != v0
+    store.delete_sessions("budi", ["a"])
+    assert list(store.load_history("budi")) == ["b"]
+    assert store.history_version("budi") != v1
+    assert set(store.session_times("budi")) == {"b"}
+
+
+def test_load_sessions_subset(store):
+    store.save_session("budi", "a", chat("a"))
+    store.save_session("budi", "b", chat("b"))
+    assert store.load_sessions("budi", ["b", "hilang"]) == {"b": chat("b")}
+
+
+def test_second_replica_sees_writes(store_url, tmp_path, store):
+    other = open_store(store_url, str(tmp_path))
+    before = other.history_version("budi")
+    store.save_session("budi", "dari replica A", chat("halo"))
+    assert other.history_version("budi") != before
+    assert other.load_history("budi") == {"dari replica A": chat("halo")}
+
+
+def test_write_returns_version_before_and_after(store_url, tmp_path, store):
+    other = open_store(store_url, str(tmp_path))
+    if isinstance(store, FileStore):
+        other = store
+    local = store.history_version("budi")
+    # Replica B nulis duluan, baru replica A: A ga boleh nelen bump punya B
+    b_before, b_after = other.save_session("budi", "dari B", chat("b"))
+    assert b_before == local
+    a_before, a_after = store.save_session("budi", "dari A", chat("a"))
+    assert a_before == b_after != local
+    assert a_after == store.history_version("budi") != a_before
+    d_before, d_after = store.delete_sessions("budi", ["dari A"])
+    assert d_before == a_after
+    assert d_after == store.history_version("budi")
+
+
+def test_concurrent_writers_do_not_lose_sessions(store_url, tmp_path, store):
+    replicas = [open_store(store_url, str(tmp_path)) for _ in range(4)]
+    # FileStore cuma aman di satu proses: replica = instance yang sama
+    if isinstance(store, FileStore):
+        replicas = [store] * 4
+    errors = []
+
+    def writer(n, replica):
+        try:
+            for i in range(15):
+                replica.save_session("budi", f"w{n}-{i}", chat(f"{n}-{i}"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n, r)) for n, r in enumerate(replicas)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    history = store.load_history("budi")
+    assert len(history) == 60
+    assert history["w3-14"] == chat("3-14")
+
+
+def test_concurrent_register_same_username(store_url, tmp_path, store):
+    replicas = [open_store(store_url, str(tmp_path)) for _ in range(4)]
+    if isinstance(store, FileStore):
+        replicas = [store] * 4
+    results = []
+    threads = [threading.Thread(target=lambda r=r, n=n: results.append(r.add_user("budi", f"h{n}")))
+               for n, r in enumerate(replicas)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [False, False, False, True]
+    assert len(store.load_users()) == 1
@@ -0,0 +1,316 @@
+"""Cold storage ZETRO: session yang lama ga disentuh dipindah ke arsip terkompres.
+
+Layout per user (``<folder>/<md5 username>/``):
+
+- ``seg_<n>.bin``  : segment append-only, isinya record terkompres (zstd kalau
+  package ``zstandard`` ada, selain itu gzip) satu per session
+- ``index.json``   : index kecil {key: title, segment, offset, length, codec, ...}.
+  Key = title, kecuali title itu udah ada di arsip: jadi "X (arsip)",
+  "X (arsip 2)", ... (sama kayak restore), biar session lama ga ketimpa.
+
+Buka satu session arsip cuma baca + decompress record-nya doang (seek ke
+offset), ga perlu buka segment lain. Record yang udah di-restore / dihapus
+jadi "dead bytes"; compactor nulis ulang segment yang kebanyakan dead bytes.
+
+``ArchiveCompactor`` jalan di background thread dan dibatasi ``IOBudget``
+(byte/detik) biar ga rebutan disk sama request user. Satu user cuma
+di-compact satu compactor sekaligus (lock ``.compact.lock``, juga antar
+replica yang share folder arsip), dan cleanup cuma buang record yang
+ditulis run itu sendiri.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+DEAD_RATIO_REWRITE = 0.5
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zst", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gz", gzip.compress(data, compresslevel=9)
+
+
+def _decompress(codec, blob):
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("Session ini diarsip pakai zstd, install package zstandard dulu")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class IOBudget:
+    """Token bucket sederhana: spend(n) nunggu sampai n byte boleh dipakai"""
+
+    def __init__(self, bytes_per_sec):
+        self.rate = bytes_per_sec
+        self.allowance = bytes_per_sec
+        self.last = time.monotonic()
+
+    def spend(self, n):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+        self.last = now
+        self.allowance -= n
+        if self.allowance < 0:
+            time.sleep(-self.allowance / self.rate)
+
+
+class SessionArchive:
+    """Arsip session terkompres per user (segment + index)"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _user_dir(self, username):
+        path = os.path.join(self.folder, hashlib.md5(username.encode()).hexdigest())
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _locked(self, username):
+        """Lock antar thread + antar proses (flock) buat satu user"""
+        return _UserLock(self.lock, os.path.join(self._user_dir(username), ".lock"))
+
+    def compaction(self, username):
+        """Lock satu user selama satu putaran compact (read -> put -> delete -> cleanup)"""
+        return _UserLock(self.compact_lock, os.path.join(self._user_dir(username), ".compact.lock"))
+
+    def _read_index(self, username):
+        path = os.path.join(self._user_dir(username), "index.json")
+        if not os.path.exists(path):
+            return {"next_segment": 0, "sessions": {}}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Index arsip {username} rusak: {e}")
+            return {"next_segment": 0, "sessions": {}}
+
+    def _write_index(self, username, index):
+        path = os.path.join(self._user_dir(username), "index.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _segment_path(self, username, segment):
+        return os.path.join(self._user_dir(username), f"seg_{segment}.bin")
+
+    def list_sessions(self, username):
+        """{title: meta} semua session di arsip (cuma baca index kecil)"""
+        return self._read_index(username)["sessions"]
+
+    def put(self, username, title, messages, touched_at):
+        """Kompres + append satu session ke segment aktif; balikin (key, record)"""
+        raw = json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        codec, blob = _compress(raw)
+        with self._locked(username):
+            index = self._read_index(username)
+            segment = max(index["next_segment"] - 1, 0)
+            path = self._segment_path(username, segment)
+            if index["next_segment"] == 0 or (os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES):
+                segment = index["next_segment"]
+                index["next_segment"] += 1
+                path = self._segment_path(username, segment)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            key = title
+            n = 1
+            while key in index["sessions"]:
+                key = f"{title} (arsip)" if n == 1 else f"{title} (arsip {n})"
+                n += 1
+            record = {
+                "title": title,
+                "segment": segment,
+                "offset": offset,
+                "length": len(blob),
+                "codec": codec,
+                "raw_bytes": len(raw),
+                "messages": len(messages),
+                "touched_at": touched_at,
+                "archived_at": time.time(),
+            }
+            index["sessions"][key] = record
+            self._write_index(username, index)
+        return key, record
+
+    def get(self, username, title):
+        """Decompress satu session dari arsip (lazy, cuma record itu yang dibaca)"""
+        with self._locked(username):
+            meta = self.list_sessions(username).get(title)
+            if meta is None:
+                return None
+            with open(self._segment_path(username, meta["segment"]), "rb") as f:
+                f.seek(meta["offset"])
+                blob = f.read(meta["length"])
+        return json.loads(_decompress(meta["codec"], blob))
+
+    def remove(self, username, key, record=None):
+        """Hapus session dari index (byte-nya jadi dead, dibersihin compactor).
+
+        Kalau ``record`` dikasih, cuma dihapus kalau entry-nya masih record
+        itu (segment + offset sama), bukan apa pun yang kebetulan key-nya sama.
+        """
+        with self._locked(username):
+            index = self._read_index(username)
+            current = index["sessions"].get(key)
+            if current is None:
+                return False
+            if record is not None and (current["segment"], current["offset"]) != (record["segment"], record["offset"]):
+                return False
+            del index["sessions"][key]
+            self._write_index(username, index)
+            return True
+
+    def rewrite_segments(self, username, budget=None):
+        """Tulis ulang segment yang dead bytes-nya > DEAD_RATIO_REWRITE; balikin byte yang dihemat"""
+        saved = 0
+        changed = False
+        with self._locked(username):
+            index = self._read_index(username)
+            live = {}
+            for title, meta in index["sessions"].items():
+                live.setdefault(meta["segment"], []).append(title)
+            for segment in range(index["next_segment"]):
+                path = self._segment_path(username, segment)
+                if not os.path.exists(path):
+                    continue
+                size = os.path.getsize(path)
+                titles = live.get(segment, [])
+                live_bytes = sum(index["sessions"][t]["length"] for t in titles)
+                if not titles:
+                    os.remove(path)
+                    saved += size
+                    changed = True
+                    continue
+                if 1 - live_bytes / size <= DEAD_RATIO_REWRITE:
+                    continue
+                tmp_path = f"{path}.tmp"
+                with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                    for title in titles:
+                        meta = index["sessions"][title]
+                        src.seek(meta["offset"])
+                        blob = src.read(meta["length"])
+                        meta["offset"] = dst.tell()
+                        dst.write(blob)
+                        if budget:
+                            budget.spend(2 * len(blob))
+                os.replace(tmp_path, path)
+                saved += size - live_bytes
+                changed = True
+            if changed:
+                self._write_index(username, index)
+        return saved
+
+
+class _UserLock:
+    def __init__(self, thread_lock, path):
+        self.thread_lock = thread_lock
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            self.fd = open(self.path, "a")
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.fd.close()
+            self.fd = None
+        self.thread_lock.release()
+        return False
+
+
+class ArchiveCompactor:
+    """Background thread: pindahin session dingin dari store hot ke arsip"""
+
+    def __init__(self, store, archive, max_age_days=30, bytes_per_sec=2 * 1024 * 1024, interval=600):
+        self.store = store
+        self.archive = archive
+        self.max_age = max_age_days * 86400
+        self.bytes_per_sec = bytes_per_sec
+        self.interval = interval
+        self.stats = {"runs": 0, "archived": 0, "bytes_in": 0, "bytes_out": 0, "last_error": None}
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="zetro-archive-compactor", daemon=True)
+        self.thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                print(f"Archive compactor error: {e}")
+            time.sleep(self.interval)
+
+    def run_once(self, now=None):
+        """Satu putaran untuk semua user; balikin jumlah session yang diarsip"""
+        budget = IOBudget(self.bytes_per_sec)
+        cutoff = (now or time.time()) - self.max_age
+        archived = 0
+        for username in self.store.load_users():
+            archived += self.archive_user(username, cutoff, budget)
+            self.archive.rewrite_segments(username, budget)
+        self.stats["runs"] += 1
+        return archived
+
+    def archive_user(self, username, cutoff, budget):
+        # Satu compactor per user sekaligus: tanpa ini dua replica bisa sama-sama
+        # put, satu delete hot copy, yang lain dapet [] lalu buang salinan arsipnya
+        with self.archive.compaction(username):
+            return self._archive_user_locked(username, cutoff, budget)
+
+    def _archive_user_locked(self, username, cutoff, budget):
+        times = self.store.session_times(username)
+        # Baca index waktu juga makan I/O, kira-kira sebesar title + timestamp
+        budget.spend(sum(len(title) + 24 for title in times))
+        cold = [t for t, ts in times.items() if ts < cutoff]
+        if not cold:
+            return 0
+        moved = {}
+        for title, messages in self.store.load_sessions(username, cold).items():
+            raw_size = len(json.dumps(messages, ensure_ascii=False))
+            key, record = self.archive.put(username, title, messages, times[title])
+            # Read dari store + write ke arsip
+            budget.spend(raw_size + record["length"])
+            self.stats["bytes_in"] += raw_size
+            self.stats["bytes_out"] += record["length"]
+            moved[title] = (key, record)
+        # Delete bersyarat di dalam lock / transaksi store: session yang di-write
+        # user setelah dibaca di atas ga kehapus, record arsip run ini dibuang lagi
+        deleted = self.store.delete_cold_sessions(username, list(moved), cutoff) if moved else []
+        for title in set(moved) - set(deleted):
+            key, record = moved[title]
+            self.archive.remove(username, key, record)
+        self.stats["archived"] += len(deleted)
+        return len(deleted)
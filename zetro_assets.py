@@ -0,0 +1,74 @@
+"""Asset UI remote ZETRO (logo engine, avatar user), di-vendor ke ``static/vendor/``.
+
+Download-nya ga pernah jalan di jalur render: ``start_fetch`` nge-download
+sekali di background thread pas app start, atau manual lewat
+``python zetro_assets.py`` (misal di build image). Selama file lokal belum
+ada, ``asset_url`` balikin URL remote aslinya, jadi browser yang ngambil
+langsung dan render ga nunggu network. ``static/vendor/`` itu output
+runtime (di-gitignore), bukan bagian dari source.
+"""
+import os
+import threading
+
+import requests
+
+VENDOR_DIR = "vendor"
+FETCH_TIMEOUT = 5
+
+# rel path di static/vendor/ -> URL asal
+REMOTE_ASSETS = {
+    "engines/gemini.png": "https://upload.wikimedia.org/wikipedia/commons/thumb/1/1d/Google_Gemini_icon_2025.svg/512px-Google_Gemini_icon_2025.svg.png",
+    "engines/deepseek.png": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTqKHD28rGat3WVaqRkRDgIL-SHgOTHB6MrNg&s",
+    "engines/meta.png": "https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Meta_Platforms_Inc._logo.svg/512px-Meta_Platforms_Inc._logo.png",
+    "engines/groq.jpg": "https://i.tracxn.com/tracxn-data-attachments/report/thumbnail/image/Groq_-_Unicorn_Business_Summary_2552daa3-40ba-4b52-b0cf-f409c6810e05.jpg?width=350",
+    "engines/qwen.png": "https://seeklogo.com/images/Q/qwen-logo-9F3C0D6D89-seeklogo.com.png",
+    "engines/pollinations.ico": "https://pollinations.ai/favicon.ico",
+    "user.jpg": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcRfIrn5orx6KdLUiIvZ3IUkZTMdIyes-D6sMA&s",
+}
+
+
+def asset_url(static_dir, static_url, rel_path):
+    """URL lokal kalau udah di-vendor, selain itu URL remote aslinya"""
+    if os.path.exists(os.path.join(static_dir, VENDOR_DIR, rel_path)):
+        return f"{static_url}/{VENDOR_DIR}/{rel_path}"
+    return REMOTE_ASSETS[rel_path]
+
+
+def fetch_assets(static_dir, timeout=FETCH_TIMEOUT):
+    """Download asset yang belum ada; balikin {rel_path: error} yang gagal"""
+    failed = {}
+    for rel_path, url in REMOTE_ASSETS.items():
+        dest = os.path.join(static_dir, VENDOR_DIR, rel_path)
+        if os.path.exists(dest):
+            continue
+        try:
+            resp = requests.get(url, timeout=timeout)
+            resp.raise_for_status()
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp_path = f"{dest}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(resp.content)
+            os.replace(tmp_path, dest)
+        except Exception as e:
+            failed[rel_path] = e
+    return failed
+
+
+def start_fetch(static_dir):
+    """fetch_assets di background thread (sekali per proses, dipanggil dari cache_resource)"""
+
+    def run():
+        for rel_path, e in fetch_assets(static_dir).items():
+            print(f"Gagal vendor asset {rel_path}: {e}")
+
+    thread = threading.Thread(target=run, name="zetro-asset-fetch", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    here = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    failed = fetch_assets(here)
+    for rel_path, e in failed.items():
+        print(f"❌ {rel_path}: {e}")
+    print(f"✅ {len(REMOTE_ASSETS) - len(failed)}/{len(REMOTE_ASSETS)} asset ada di static/{VENDOR_DIR}/")
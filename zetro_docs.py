@@ -0,0 +1,292 @@
+"""Ingestion dokumen ZETRO (txt / md / csv / pdf).
+
+Alurnya:
+
+1. ``spool_upload``: file upload di-copy ke disk per blok sambil di-hash.
+   ``UploadedFile`` Streamlit sendiri udah BytesIO di RAM (dibatasi
+   ``server.maxUploadSize``); spool cuma ngehindarin copy tambahan
+   (``getvalue()``) dan bikin parse di worker jalan dari disk. Nama file =
+   sha256 isinya, upload yang sama (dari user mana pun) cukup disimpan sekali.
+2. ``ingest_document`` (jalan di worker pool): parse bertahap (per baris /
+   per row / per halaman), potong jadi chunk ~``CHUNK_TOKENS`` token,
+   tulis chunk ke ``<hash>.chunks.jsonl`` dan vektor ke ``<hash>.vec``
+   sambil jalan. Token count tiap chunk dihitung sekali dan disimpan di
+   ``<hash>.index.json``. Satu hash cuma di-ingest satu proses sekaligus
+   (flock ``<hash>.lock``), file sementara namanya unik per proses.
+3. ``search_documents``: embed query, ambil chunk paling relevan sampai
+   budget token habis, baca cuma chunk itu dari disk (seek per offset).
+
+``pypdf`` opsional; tanpa itu PDF ditolak dengan pesan yang jelas.
+"""
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from zetro_memory import get_embedder
+
+SPOOL_BLOCK = 1024 * 1024
+CHUNK_TOKENS = 400
+EMBED_BATCH = 64
+DOC_KINDS = {".txt": "text", ".md": "text", ".csv": "csv", ".pdf": "pdf"}
+
+
+def estimate_tokens(text):
+    """Estimasi kasar jumlah token (~4 karakter per token), dipakai juga sama app"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def doc_kind(filename):
+    """Jenis dokumen dari ekstensi (None kalau bukan dokumen)"""
+    return DOC_KINDS.get(os.path.splitext(filename)[1].lower())
+
+
+def _paths(folder, doc_hash):
+    base = os.path.join(folder, doc_hash)
+    return {
+        "raw": base + ".raw",
+        "chunks": base + ".chunks.jsonl",
+        "vec": base + ".vec",
+        "index": base + ".index.json",
+    }
+
+
+def spool_upload(fileobj, folder):
+    """Copy upload ke disk per blok + sha256; balikin (hash, size). Duplikat ga ditulis ulang"""
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(dir=folder, suffix=".part", delete=False) as tmp:
+        while True:
+            block = fileobj.read(SPOOL_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+            size += len(block)
+    doc_hash = digest.hexdigest()
+    raw_path = _paths(folder, doc_hash)["raw"]
+    if os.path.exists(raw_path):
+        os.remove(tmp.name)
+    else:
+        os.replace(tmp.name, raw_path)
+    return doc_hash, size
+
+
+@contextmanager
+def _hash_lock(folder, doc_hash):
+    """Lock antar proses per dokumen (dua user upload file yang sama barengan)"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(folder, doc_hash + ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _temp_path(folder, final_path):
+    fd, path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(final_path) + ".", suffix=".tmp")
+    os.close(fd)
+    return path
+
+
+def _iter_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for n, line in enumerate(f, 1):
+            yield f"baris {n}", line
+
+
+def _iter_csv(path):
+    with open(path, "r", newline="", encoding="utf-8", errors="replace") as f:
+        for n, row in enumerate(csv.reader(f), 1):
+            yield f"row {n}", ", ".join(row) + "\n"
+
+
+def _iter_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("Buat baca PDF perlu package pypdf (pip install pypdf)")
+    reader = PdfReader(path)
+    for n, page in enumerate(reader.pages, 1):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield f"hal {n}", text + "\n"
+
+
+def _iter_chunks(blocks, header=None):
+    """Gabung block jadi chunk ~CHUNK_TOKENS token; block kepanjangan dipotong"""
+    max_chars = CHUNK_TOKENS * 4
+    parts, size, first = [], 0, None
+    for where, text in blocks:
+        while len(text) > max_chars:
+            if parts:
+                yield first, last, header, "".join(parts)
+                parts, size = [], 0
+            yield where, where, header, text[:max_chars]
+            text = text[max_chars:]
+        if not text.strip():
+            continue
+        if size + len(text) > max_chars and parts:
+            yield first, last, header, "".join(parts)
+            parts, size = [], 0
+        if not parts:
+            first = where
+        parts.append(text)
+        size += len(text)
+        last = where
+    if parts:
+        yield first, last, header, "".join(parts)
+
+
+def _blocks(path, kind):
+    """(blocks, header): header CSV diulang di tiap chunk biar kolomnya tetap jelas"""
+    if kind == "csv":
+        rows = _iter_csv(path)
+        first = next(rows, None)
+        return rows, (first[1] if first else None)
+    if kind == "pdf":
+        return _iter_pdf(path), None
+    return _iter_text(path), None
+
+
+def ingest_document(folder, doc_hash, kind, embedder=None):
+    """Parse + chunk + embed satu dokumen (idempotent, aman dijalanin paralel di thread / proses lain).
+
+    ``embedder`` sebaiknya embedder shared punya app (sama kayak ``search_documents``);
+    kalau kosong baru di-load sendiri.
+    """
+    paths = _paths(folder, doc_hash)
+    if os.path.exists(paths["index"]):
+        return load_doc_index(folder, doc_hash)
+    with _hash_lock(folder, doc_hash):
+        # Proses lain mungkin barusan selesai ingest hash yang sama
+        if os.path.exists(paths["index"]):
+            return load_doc_index(folder, doc_hash)
+        return _ingest_locked(folder, doc_hash, kind, paths, embedder or get_embedder())
+
+
+def _ingest_locked(folder, doc_hash, kind, paths, embedder):
+    offsets, tokens, wheres = [], [], []
+    batch = []
+
+    def flush(vec_file):
+        vecs = embedder.embed(batch).astype(np.float32)
+        vec_file.write(vecs.tobytes())
+        batch.clear()
+
+    blocks, header = _blocks(paths["raw"], kind)
+    tmp = {name: _temp_path(folder, paths[name]) for name in ("chunks", "vec", "index")}
+    try:
+        with open(tmp["chunks"], "wb") as chunk_file, open(tmp["vec"], "wb") as vec_file:
+            for first, last, head, body in _iter_chunks(blocks, header):
+                text = f"{head}{body}" if head else body
+                offsets.append(chunk_file.tell())
+                chunk_file.write(json.dumps({"text": text}, ensure_ascii=False).encode("utf-8") + b"\n")
+                tokens.append(estimate_tokens(text))
+                wheres.append(first if first == last else f"{first} - {last}")
+                batch.append(text)
+                if len(batch) >= EMBED_BATCH:
+                    flush(vec_file)
+            if batch:
+                flush(vec_file)
+        index = {
+            "hash": doc_hash,
+            "kind": kind,
+            "embedder": embedder.name,
+            "dim": embedder.dim,
+            "offsets": offsets,
+            "tokens": tokens,
+            "where": wheres,
+        }
+        with open(tmp["index"], "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        # Index paling akhir: begitu index ada, chunks + vec pasti udah lengkap
+        os.replace(tmp["chunks"], paths["chunks"])
+        os.replace(tmp["vec"], paths["vec"])
+        os.replace(tmp["index"], paths["index"])
+    finally:
+        for path in tmp.values():
+            if os.path.exists(path):
+                os.remove(path)
+    return index
+
+
+def load_doc_index(folder, doc_hash):
+    """Index chunk (offset, token count, lokasi) tanpa baca isi dokumen"""
+    with open(_paths(folder, doc_hash)["index"], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_chunks(folder, doc_hash, offsets):
+    out = []
+    with open(_paths(folder, doc_hash)["chunks"], "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            out.append(json.loads(f.readline())["text"])
+    return out
+
+
+def search_documents(folder, docs, query, embedder, budget_tokens, k=8, min_score=0.1, missing=None):
+    """Chunk paling relevan dari beberapa dokumen, muat di budget token.
+
+    ``docs`` = list (hash, nama). Kalau ga ada yang relevan (misal "ringkas
+    dokumen ini"), ambil chunk paling awal tiap dokumen. Dokumen yang file
+    index-nya ga ada di ``folder`` di-skip; namanya masuk ke list ``missing``.
+    """
+    if not docs:
+        return []
+    q = embedder.embed([query])[0] if query else None
+    indexes = []
+    for doc_hash, name in docs:
+        try:
+            indexes.append((doc_hash, name, load_doc_index(folder, doc_hash)))
+        except FileNotFoundError:
+            if missing is not None:
+                missing.append(name)
+    candidates = []
+    for doc_hash, name, index in indexes:
+        count = len(index["offsets"])
+        if not count or q is None or index["embedder"] != embedder.name:
+            continue
+        vecs = np.memmap(_paths(folder, doc_hash)["vec"], dtype=np.float32, mode="r", shape=(count, index["dim"]))
+        scores = np.asarray(vecs @ q)
+        for i in np.argsort(-scores)[:k]:
+            if scores[i] >= min_score:
+                candidates.append((float(scores[i]), doc_hash, name, int(i), index))
+    if candidates:
+        candidates.sort(key=lambda c: -c[0])
+    else:
+        # Query generik: pakai bagian awal tiap dokumen, gantian antar dokumen
+        for doc_hash, name, index in indexes:
+            candidates += [(0.0, doc_hash, name, i, index) for i in range(min(k, len(index["offsets"])))]
+        candidates.sort(key=lambda c: c[3])
+    picked, used = [], 0
+    for score, doc_hash, name, i, index in candidates:
+        cost = index["tokens"][i]
+        if used + cost > budget_tokens:
+            continue
+        picked.append((doc_hash, name, i, index, score))
+        used += cost
+        if len(picked) >= k:
+            break
+    hits = []
+    for doc_hash, name, i, index, score in picked:
+        text = _read_chunks(folder, doc_hash, [index["offsets"][i]])[0]
+        hits.append({"name": name, "where": index["where"][i], "text": text, "score": score})
+    return hits
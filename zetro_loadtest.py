@@ -0,0 +1,401 @@
+"""Load test ZETRO: N user simulasi lewat streamlit AppTest + mock provider.
+
+Tiap user jalan di thread sendiri dan melakukan skenario:
+login -> chat beberapa turn -> upload gambar -> new session -> chat ->
+switch balik ke session pertama. Provider (Groq, HF, Gemini) diganti mock
+lokal yang nge-stream token dengan rate yang bisa diatur, jadi yang diukur
+murni kapasitas proses Streamlit (rerun, file write, streaming).
+
+Contoh:
+    python zetro_loadtest.py --users 1,4,8,16 --turns 3 --tokens-per-sec 200
+    python zetro_loadtest.py --users 1,4,8 --engine "Local CPU"
+
+Output: p50/p95/p99 latency per rerun, TTFT, CPU dan RSS per level
+concurrency.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "streamlit_app.py")
+USER_TAG_RE = re.compile(r"\[(lt\d+)\]")
+PASSWORD = "loadtest"
+
+
+# --- MOCK PROVIDERS ---
+class Recorder:
+    """Catat kapan chunk pertama keluar per user (buat TTFT)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.first_chunk_at = {}
+
+    def mark_first_chunk(self, user):
+        with self.lock:
+            self.first_chunk_at.setdefault(user, time.perf_counter())
+
+    def pop(self, user):
+        with self.lock:
+            return self.first_chunk_at.pop(user, None)
+
+
+class MockStream:
+    """Stream token palsu; bentuk chunk cocok buat Groq/HF (choices) dan Gemini (text)"""
+
+    def __init__(self, recorder, user, n_tokens, tokens_per_sec, first_token_delay):
+        self.recorder = recorder
+        self.user = user
+        self.n_tokens = n_tokens
+        self.interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0
+        self.first_token_delay = first_token_delay
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.first_token_delay)
+        for i in range(self.n_tokens):
+            if self.closed:
+                return
+            if i == 0:
+                self.recorder.mark_first_chunk(self.user)
+            piece = f"tok{i} "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], text=piece)
+            if self.interval:
+                time.sleep(self.interval)
+
+    def close(self):
+        self.closed = True
+
+
+def _find_user(payload):
+    match = USER_TAG_RE.search(json.dumps(payload, default=str))
+    return match.group(1) if match else "unknown"
+
+
+def install_mock_providers(recorder, n_tokens, tokens_per_sec, first_token_delay):
+    """Ganti client Groq / HF / Gemini dengan mock lokal (monkeypatch module)"""
+    import google.generativeai as genai
+    import groq
+    import huggingface_hub
+
+    def make_stream(payload):
+        return MockStream(recorder, _find_user(payload), n_tokens, tokens_per_sec, first_token_delay)
+
+    class MockCompletions:
+        def create(self, messages, stream=False, **kwargs):
+            if stream:
+                return make_stream(messages)
+            text = "".join(chunk.text for chunk in make_stream(messages))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+    class MockGroq:
+        def __init__(self, *args, **kwargs):
+            self.chat = SimpleNamespace(completions=MockCompletions())
+
+    class MockInferenceClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def chat_completion(self, messages, **kwargs):
+            return make_stream(messages)
+
+    class MockChatSession:
+        def __init__(self, history):
+            self.history = list(history or [])
+
+        def send_message(self, message, stream=False, **kwargs):
+            return make_stream(message)
+
+    class MockGenerativeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        @classmethod
+        def from_cached_content(cls, *args, **kwargs):
+            return cls()
+
+        def start_chat(self, history=None, **kwargs):
+            return MockChatSession(history)
+
+    groq.Groq = MockGroq
+    huggingface_hub.InferenceClient = MockInferenceClient
+    genai.configure = lambda *args, **kwargs: None
+    genai.GenerativeModel = MockGenerativeModel
+
+
+def patch_apptest_for_threads():
+    """Bikin AppTest aman dijalanin paralel di banyak thread.
+
+    - AppTest nge-set/reset Runtime._instance global tiap run; run yang
+      selesai duluan bikin run lain crash ("Runtime hasn't been created").
+      Patch ini nyimpen runtime terakhir.
+    - ast.parse paralel di CPython 3.11 bisa SystemError ("AST constructor
+      recursion depth mismatch"), jadi semua ast.parse di-serialize.
+    """
+    import ast
+
+    from streamlit.runtime import Runtime
+
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if last:
+            return last[0]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+    parse_lock = threading.Lock()
+    original_parse = ast.parse
+
+    def parse(*args, **kwargs):
+        with parse_lock:
+            return original_parse(*args, **kwargs)
+
+    ast.parse = parse
+
+
+# --- SIMULATED USER ---
+def sample_png(seed):
+    """Gambar PNG kecil buat skenario upload"""
+    from PIL import Image
+
+    img = Image.new("RGB", (640, 480), ((seed * 40) % 256, 120, 200))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def current_rss_mb():
+    """RSS sekarang (Linux /proc), fallback ke peak RSS dari getrusage"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class SimulatedUser:
+    def __init__(self, user, recorder, turns, timeout, engine=None):
+        from streamlit.testing.v1 import AppTest
+
+        self.user = user
+        self.recorder = recorder
+        self.turns = turns
+        self.engine = engine
+        # Secrets sengaja ga diisi lewat at.secrets: AppTest nuker st.secrets global
+        # tiap run, dan itu race antar thread. Pakai secrets.toml di workdir aja.
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.latencies = []
+        self.ttfts = []
+        self.errors = []
+
+    def _timed(self, action, fn, expect_ai=False):
+        self.recorder.pop(self.user)
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            self.errors.append(f"{action}: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        self.latencies.append((action, elapsed))
+        if self.at.exception:
+            self.errors.append(f"{action}: {self.at.exception[0].value}")
+        if expect_ai:
+            first = self.recorder.pop(self.user)
+            if first is not None:
+                self.ttfts.append(first - start)
+
+    def chat(self, text):
+        prompt = f"[{self.user}] {text}"
+        self._timed("chat", lambda: self.at.chat_input[0].set_value(prompt).run(), expect_ai=True)
+
+    def run(self):
+        at = self.at
+        self._timed("open", at.run)
+
+        def login():
+            at.text_input(key="login_user").input(self.user)
+            at.text_input(key="login_pass").input(PASSWORD)
+            at.button(key="btn_login").click().run()
+
+        self._timed("login", login)
+        if self.errors:
+            return self
+        if self.engine:
+            self._timed("select_engine", lambda: at.button(key=f"engine_btn_{self.engine}").click().run())
+
+        for i in range(self.turns):
+            self.chat(f"turn {i}: jelasin konsep nomor {i} dong")
+        first_session = at.session_state["current_session_key"]
+
+        def upload():
+            files = [(f"{self.user}_{i}.png", sample_png(i), "image/png") for i in range(2)]
+            if hasattr(at, "file_uploader"):
+                at.file_uploader[0].set_value(files).run()
+                return
+            # Streamlit lama: AppTest belum support file_uploader, inject hasil preprocess langsung
+            from zetro_vision import preprocess_image
+
+            processed = [preprocess_image(data) for _, data, _ in files]
+            for p in processed:
+                at.session_state["image_cache"][p["hash"]] = p
+            at.session_state["uploaded_images"] = [p["hash"] for p in processed]
+            at.run()
+
+        self._timed("upload", upload)
+        self.chat("ini screenshot-nya, gimana menurut lu?")
+
+        self._timed("new_session", lambda: at.button(key="btn_new_session").click().run())
+        self.chat("topik baru nih")
+
+        self._timed("switch_session", lambda: at.button(key=f"load_{first_session}").click().run())
+        if at.session_state["current_session_key"] != first_session:
+            keys = [b.key for b in at.button if str(b.key).startswith("load_")]
+            self.errors.append(f"switch_session: masih di {at.session_state['current_session_key']!r}, ada {keys} / {list(at.session_state['all_chats'])}")
+        return self
+
+
+# --- REPORT ---
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def prepare_workdir(path, n_users):
+    """Workdir bersih: DB user baru, semua user lt<i> udah terdaftar"""
+    secrets_dir = os.path.join(path, ".streamlit")
+    os.makedirs(secrets_dir, exist_ok=True)
+    with open(os.path.join(secrets_dir, "secrets.toml"), "w") as f:
+        f.write('GROQ_API_KEY = "mock"\nHF_TOKEN = "mock"\nGEMINI_API_KEY = "mock"\n')
+    db = os.path.join(path, "zetro_users_db")
+    shutil.rmtree(db, ignore_errors=True)
+    os.makedirs(db)
+    pw_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    with open(os.path.join(db, "users.json"), "w") as f:
+        json.dump({f"lt{i}": pw_hash for i in range(n_users)}, f)
+    if os.environ.get("ZETRO_STORE_URL"):
+        # Backend shared (SQLite / Redis): daftarin user lewat store-nya juga
+        from zetro_store import open_store
+
+        store = open_store(os.environ["ZETRO_STORE_URL"], db)
+        for i in range(n_users):
+            store.add_user(f"lt{i}", pw_hash)
+
+
+def run_level(n_users, args, recorder):
+    prepare_workdir(args.workdir, n_users)
+    users = [SimulatedUser(f"lt{i}", recorder, args.turns, args.timeout, args.engine) for i in range(n_users)]
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_users) as pool:
+        done = list(pool.map(lambda u: u.run(), users))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = [lat for u in done for _, lat in u.latencies]
+    ttfts = [t for u in done for t in u.ttfts]
+    errors = [e for u in done for e in u.errors]
+    return {
+        "users": n_users,
+        "reruns": len(latencies),
+        "wall_s": wall,
+        "rerun_p50_ms": percentile(latencies, 50) * 1000,
+        "rerun_p95_ms": percentile(latencies, 95) * 1000,
+        "rerun_p99_ms": percentile(latencies, 99) * 1000,
+        "ttft_p50_ms": percentile(ttfts, 50) * 1000,
+        "ttft_p95_ms": percentile(ttfts, 95) * 1000,
+        "ttft_p99_ms": percentile(ttfts, 99) * 1000,
+        "cpu_pct": 100 * cpu / wall if wall else 0.0,
+        "rss_mb": current_rss_mb(),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+    }
+
+
+def print_table(rows):
+    cols = ["users", "reruns", "rerun_p50_ms", "rerun_p95_ms", "rerun_p99_ms",
+            "ttft_p50_ms", "ttft_p95_ms", "ttft_p99_ms", "cpu_pct", "rss_mb", "errors"]
+    print(" | ".join(f"{c:>12}" for c in cols))
+    for row in rows:
+        cells = []
+        for c in cols:
+            v = row[c]
+            cells.append(f"{v:>12.1f}" if isinstance(v, float) else f"{v:>12}")
+        print(" | ".join(cells))
+    for row in rows:
+        for sample in row["error_samples"]:
+            print(f"[{row['users']} users] error: {sample}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ZETRO concurrent load test (AppTest + mock engines)")
+    parser.add_argument("--users", default="1,2,4,8", help="level concurrency, dipisah koma")
+    parser.add_argument("--turns", type=int, default=3, help="jumlah chat turn awal per user")
+    parser.add_argument("--tokens", type=int, default=60, help="token per jawaban mock")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="kecepatan stream mock (0 = tanpa delay)")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="delay sebelum token pertama (detik)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout per AppTest run (detik)")
+    parser.add_argument("--engine", default=None, help="nama engine di sidebar (default: engine pertama)")
+    parser.add_argument("--workdir", default=None, help="folder kerja (default: temp dir)")
+    parser.add_argument("--json", dest="json_out", default=None, help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+
+    levels = [int(x) for x in args.users.split(",") if x.strip()]
+    args.workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="zetro_lt_"))
+    if args.json_out:
+        args.json_out = os.path.abspath(args.json_out)
+    os.makedirs(args.workdir, exist_ok=True)
+    sys.path.insert(0, APP_DIR)
+    os.chdir(args.workdir)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    # Harness pakai provider mock, jadi Local CPU boleh pakai echo backend
+    os.environ.setdefault("ZETRO_LOCAL_ECHO", "1")
+    if args.tokens_per_sec:
+        # Echo backend engine lokal ikut kecepatan yang sama dengan mock provider
+        os.environ.setdefault("ZETRO_LOCAL_STEP_DELAY", str(1 / args.tokens_per_sec))
+
+    patch_apptest_for_threads()
+    recorder = Recorder()
+    install_mock_providers(recorder, args.tokens, args.tokens_per_sec, args.first_token_delay)
+
+    rows = []
+    for n in levels:
+        print(f"▶️ {n} concurrent users...", flush=True)
+        rows.append(run_level(n, args, recorder))
+    print_table(rows)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 1 if any(row["errors"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Engine lokal ZETRO: model kecil di CPU + continuous batching.
+
+Semua request dari semua session masuk satu antrian. Scheduler thread
+jalan per "step": tiap step request baru boleh masuk slot yang kosong
+(ga nunggu batch sebelumnya selesai), lalu semua slot aktif maju satu
+token bareng. Request yang selesai / di-stop langsung lepas slot-nya di
+token boundary berikutnya.
+
+Backend:
+
+- ``LlamaCppBackend``: model GGUF terkuantisasi lewat ``llama-cpp-python``
+  (path dari env / secret ``ZETRO_LOCAL_MODEL``). Satu ``Llama`` per slot,
+  bobot model di-mmap jadi cuma ada sekali di RAM; token tiap slot di-decode
+  paralel di thread pool (llama.cpp lepas GIL pas eval).
+- ``EchoBackend``: deterministik, tanpa model. Cuma buat CI / benchmark,
+  harus diminta eksplisit (``allow_echo``); ga pernah jadi fallback diam-diam.
+
+Chunk yang keluar bentuknya sama kayak chunk OpenAI / Groq
+(``chunk.choices[0].delta.content``), jadi bisa lewat loop streaming yang sama.
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+DEFAULT_MAX_BATCH = 4
+ECHO_WORDS = (
+    "oke", "bro", "jadi", "intinya", "kita", "bisa", "coba", "pakai", "cara", "ini",
+    "dulu", "terus", "cek", "hasilnya", "nanti", "lanjut", "step", "berikutnya", "ya", "mantap",
+)
+_DONE = object()
+
+
+def _chunk(text):
+    """Chunk streaming bentuk OpenAI: chunk.choices[0].delta.content"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=None)])
+
+
+class EchoBackend:
+    """Backend deterministik: jawaban sama persis untuk prompt + setting yang sama"""
+
+    name = "echo"
+    parallel = False
+
+    def __init__(self, step_delay=0.0):
+        # Simulasi waktu decode satu step (satu token untuk semua slot sekaligus)
+        self.step_delay = step_delay
+
+    def start(self, messages, max_tokens, temperature):
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        seed = hashlib.sha256(f"{last_user}\x00{max_tokens}\x00{temperature}".encode("utf-8")).digest()
+        return self._generate(re.findall(r"\S+", str(last_user))[:12], seed, max_tokens)
+
+    def _generate(self, echoed, seed, max_tokens):
+        words = ["🖥️", "ZETRO", "lokal:"] + echoed + ["—"]
+        i = 0
+        while len(words) < max_tokens and len(words) < 64:
+            words.append(ECHO_WORDS[seed[i % len(seed)] % len(ECHO_WORDS)])
+            i += 1
+        for n, word in enumerate(words[:max_tokens]):
+            yield word if n == 0 else f" {word}"
+
+
+class LlamaCppBackend:
+    """Model GGUF via llama-cpp-python, satu context per slot (bobot di-share via mmap)"""
+
+    name = "llama.cpp"
+    parallel = True
+    step_delay = 0.0
+
+    def __init__(self, model_path, n_slots, n_ctx=4096, n_threads=None):
+        from llama_cpp import Llama
+
+        threads = n_threads or max(1, (os.cpu_count() or 1) // n_slots)
+        self.slots = queue.Queue()
+        for _ in range(n_slots):
+            self.slots.put(Llama(model_path=model_path, n_ctx=n_ctx, n_threads=threads, use_mmap=True, verbose=False))
+        self.name = f"llama.cpp:{os.path.basename(model_path)}"
+
+    def start(self, messages, max_tokens, temperature):
+        return self._generate(messages, max_tokens, temperature)
+
+    def _generate(self, messages, max_tokens, temperature):
+        llm = self.slots.get()
+        try:
+            stream = llm.create_chat_completion(
+                messages=messages, max_tokens=max_tokens, temperature=temperature, stream=True
+            )
+            for chunk in stream:
+                text = chunk["choices"][0]["delta"].get("content")
+                if text:
+                    yield text
+        finally:
+            self.slots.put(llm)
+
+
+class LocalRequest:
+    """Satu request di scheduler; di-iterate sebagai stream chunk"""
+
+    def __init__(self, messages, max_tokens, temperature):
+        self.messages = [{"role": m["role"], "content": m["content"]} for m in messages]
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.out = queue.Queue()
+        self.cancelled = False
+        self.tokens = None
+
+    def __iter__(self):
+        while True:
+            item = self.out.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield _chunk(item)
+
+    def close(self):
+        """Stop: slot dilepas di token boundary berikutnya"""
+        self.cancelled = True
+
+
+class LocalEngine:
+    """Scheduler continuous batching di atas satu backend"""
+
+    def __init__(self, backend, max_batch=DEFAULT_MAX_BATCH):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.active = []
+        self.step_pool = ThreadPoolExecutor(max_workers=max_batch) if backend.parallel else None
+        self.stats = {"requests": 0, "tokens": 0, "steps": 0, "max_active": 0}
+        self.thread = threading.Thread(target=self._loop, name="zetro-local-scheduler", daemon=True)
+        self.thread.start()
+
+    def submit(self, messages, max_tokens=512, temperature=0.7):
+        """Antriin request, balikin stream yang bisa langsung di-iterate"""
+        req = LocalRequest(messages, max_tokens, temperature)
+        self.pending.put(req)
+        return req
+
+    def _admit(self):
+        # Request baru masuk ke slot kosong di tiap token boundary
+        block = not self.active
+        while len(self.active) < self.max_batch:
+            try:
+                req = self.pending.get(block=block)
+            except queue.Empty:
+                break
+            block = False
+            if req.cancelled:
+                req.out.put(_DONE)
+                continue
+            try:
+                req.tokens = self.backend.start(req.messages, req.max_tokens, req.temperature)
+            except Exception as e:
+                req.out.put(e)
+                continue
+            self.active.append(req)
+            self.stats["requests"] += 1
+        self.stats["max_active"] = max(self.stats["max_active"], len(self.active))
+
+    def _next_token(self, req):
+        if req.cancelled:
+            return _DONE
+        try:
+            return next(req.tokens)
+        except StopIteration:
+            return _DONE
+        except Exception as e:
+            return e
+
+    def _loop(self):
+        while True:
+            self._admit()
+            if self.backend.step_delay:
+                time.sleep(self.backend.step_delay)
+            if self.step_pool is not None and len(self.active) > 1:
+                results = list(self.step_pool.map(self._next_token, self.active))
+            else:
+                results = [self._next_token(req) for req in self.active]
+            self.stats["steps"] += 1
+            still_active = []
+            for req, item in zip(self.active, results):
+                if item is _DONE or isinstance(item, Exception):
+                    req.tokens.close()
+                    req.out.put(item)
+                    if isinstance(item, Exception):
+                        req.out.put(_DONE)
+                    continue
+                self.stats["tokens"] += 1
+                req.out.put(item)
+                still_active.append(req)
+            self.active = still_active
+
+
+def create_engine(model_path=None, max_batch=DEFAULT_MAX_BATCH, allow_echo=False):
+    """LlamaCppBackend dari model_path; EchoBackend cuma kalau ga ada model dan allow_echo.
+
+    Model yang dikonfigurasi tapi gagal di-load = RuntimeError, bukan echo.
+    """
+    if model_path:
+        try:
+            return LocalEngine(LlamaCppBackend(model_path, max_batch), max_batch)
+        except Exception as e:
+            raise RuntimeError(f"Local model {model_path} gagal di-load: {e}") from e
+    if not allow_echo:
+        raise RuntimeError("Local engine belum dikonfigurasi (set ZETRO_LOCAL_MODEL)")
+    delay = float(os.environ.get("ZETRO_LOCAL_STEP_DELAY", "0") or 0)
+    return LocalEngine(EchoBackend(step_delay=delay), max_batch)
@@ -0,0 +1,332 @@
+"""Retrieval memory lokal untuk ZETRO.
+
+Tiap pesan di-embed sekali lalu disimpan di matrix NumPy memory-mapped per
+user (``mem_<hash>.npy``). Di samping matrix cuma ada key + posisi pesan
+(``mem_<hash>.keys.jsonl``, append-only), isi pesan ga pernah disimpan di
+index: teksnya diambil dari history yang masih hidup pas search. Index
+di-key per session ID (``sid`` di pesan pertama session), bukan title, jadi
+session baru dengan title sama ga kebagian memory session yang udah dihapus.
+Tiap turn cuma top-k pesan lama paling relevan yang ikut dikirim ke model.
+
+File index boleh di-share beberapa proses (replica di satu host / shared
+volume): tiap operasi pegang flock ``mem_<hash>.lock`` dan sebelum jalan
+nyusul dulu perubahan proses lain (matrix yang di-grow / di-reset di-map
+ulang, baris baru di ``.keys.jsonl`` dibaca dari offset terakhir).
+
+Embedder default adalah hashing vectorizer (tanpa network, tanpa model).
+Kalau env ``ZETRO_EMBED_MODEL`` diisi dan ``sentence-transformers`` ada,
+model lokal itu yang dipakai (CPU).
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+EMBED_DIM = 384
+MIN_CAPACITY = 256
+META_VERSION = 2
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """Signed hashing vectorizer (unigram + bigram), deterministik antar proses"""
+
+    name = f"hashing-{EMBED_DIM}"
+    dim = EMBED_DIM
+
+    def _features(self, text):
+        words = TOKEN_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            slots = [_feature_slot(feat) for feat in self._features(text)]
+            if slots:
+                idx, sign = zip(*slots)
+                np.add.at(out[row], list(idx), list(sign))
+        return _normalize(out)
+
+
+@functools.lru_cache(maxsize=200_000)
+def _feature_slot(feat):
+    """(index, sign) satu fitur; di-cache karena kata yang sama muncul terus"""
+    digest = hashlib.md5(feat.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little") % EMBED_DIM, 1.0 if digest[4] & 1 else -1.0
+
+
+class SentenceTransformerEmbedder:
+    """Model embedding lokal kecil (contoh: all-MiniLM-L6-v2) di CPU"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"st-{model_name}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vecs = self.model.encode(list(texts), batch_size=32, convert_to_numpy=True)
+        return _normalize(vecs.astype(np.float32))
+
+
+def _normalize(mat):
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def get_embedder():
+    """Pilih embedder: model lokal kalau dikonfigurasi, fallback ke hashing"""
+    model_name = os.environ.get("ZETRO_EMBED_MODEL")
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Embed model {model_name} gagal di-load, pakai hashing: {e}")
+    return HashingEmbedder()
+
+
+def new_session_id():
+    """ID unik session baru, disimpan sebagai ``sid`` di pesan pertamanya"""
+    return uuid.uuid4().hex[:16]
+
+
+def session_id(title, messages):
+    """ID session; session lama tanpa ``sid`` pakai title-nya"""
+    if messages and messages[0].get("sid"):
+        return messages[0]["sid"]
+    return f"title:{title}"
+
+
+def message_key(sid, message):
+    """Key stabil per pesan, biar tiap pesan cuma di-embed sekali"""
+    raw = f"{sid}\x00{message.get('role')}\x00{message.get('content')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class MemoryIndex:
+    """Index vektor per user di atas np.memmap (isi pesan ga ikut disimpan)"""
+
+    def __init__(self, base_path, embedder):
+        self.base_path = base_path
+        self.vec_path = base_path + ".npy"
+        self.meta_path = base_path + ".meta.json"
+        self.keys_path = base_path + ".keys.jsonl"
+        self.lock_path = base_path + ".lock"
+        self.embedder = embedder
+        self.lock = threading.Lock()
+        self.items = []
+        self.row_of = {}
+        self.matrix = None
+        self._sid_col = None
+        self._vec_id = None
+        self._keys_id = None
+        self._keys_offset = 0
+        with self._locked():
+            self._load()
+
+    @contextmanager
+    def _locked(self):
+        """Lock thread + flock antar proses yang share file index yang sama"""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        meta = None
+        if os.path.exists(self.meta_path) and os.path.exists(self.vec_path):
+            try:
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                print(f"Memory meta rusak, rebuild: {e}")
+        if not meta or meta.get("embedder") != self.embedder.name or meta.get("version") != META_VERSION:
+            # Rebuild (meta format lama yang masih nyimpen isi pesan ikut ketimpa)
+            self._reset()
+            return
+        self._refresh()
+
+    def _refresh(self):
+        """Nyusul write proses lain (dipanggil di dalam ``_locked``)"""
+        vec_id = _file_id(self.vec_path)
+        if vec_id != self._vec_id:
+            # Matrix di-grow / di-reset proses lain (os.replace -> inode baru)
+            self.matrix = None
+            self.matrix = np.load(self.vec_path, mmap_mode="r+")
+            self._vec_id = vec_id
+        keys_id = _file_id(self.keys_path)
+        if keys_id is None:
+            return
+        if keys_id[0] != (self._keys_id or (None,))[0] or keys_id[1] < self._keys_offset:
+            # File keys diganti (reset) -> baca ulang dari awal
+            self.items = []
+            self.row_of = {}
+            self._keys_offset = 0
+        self._keys_id = keys_id
+        if keys_id[1] == self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # baris terakhir kepotong (crash pas append)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self._keys_offset += len(line)
+                if "forget" in entry:
+                    self._tombstone(entry["forget"])
+                elif len(self.items) < self.matrix.shape[0]:
+                    self.row_of[entry["key"]] = len(self.items)
+                    self.items.append(entry)
+        self._sid_col = None
+
+    def _reset(self):
+        self.items = []
+        self.row_of = {}
+        self._create(MIN_CAPACITY)
+        tmp_path = self.keys_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8"):
+            pass
+        os.replace(tmp_path, self.keys_path)
+        self._keys_id = _file_id(self.keys_path)
+        self._keys_offset = 0
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"embedder": self.embedder.name, "version": META_VERSION}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _create(self, capacity, copy_rows=0):
+        tmp_path = self.vec_path + ".tmp.npy"
+        new = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.embedder.dim))
+        if copy_rows:
+            new[:copy_rows] = self.matrix[:copy_rows]
+        new.flush()
+        del new
+        self.matrix = None
+        os.replace(tmp_path, self.vec_path)
+        self.matrix = np.load(self.vec_path, mmap_mode="r+")
+        self._vec_id = _file_id(self.vec_path)
+
+    def _append_entries(self, entries):
+        data = "".join(json.dumps(e) + "\n" for e in entries).encode("utf-8")
+        with open(self.keys_path, "ab") as f:
+            f.write(data)
+        self._keys_offset += len(data)
+        self._keys_id = _file_id(self.keys_path)
+
+    def _tombstone(self, sid):
+        """Tandai semua baris session sid kehapus; balikin index barisnya"""
+        rows = [i for i, item in enumerate(self.items) if item.get("sid") == sid]
+        for i in rows:
+            self.row_of.pop(self.items[i]["key"], None)
+            self.items[i] = {"key": None, "sid": None, "pos": -1, "role": None}
+        self._sid_col = None
+        return rows
+
+    def sync(self, all_chats):
+        """Embed pesan yang belum ke-index (dari semua session)"""
+        with self._locked():
+            self._refresh()
+            new_items, texts = {}, []
+            for title, messages in all_chats.items():
+                sid = session_id(title, messages)
+                for pos, m in enumerate(messages):
+                    if m.get("type") == "image" or not isinstance(m.get("content"), str):
+                        continue
+                    key = message_key(sid, m)
+                    if key not in self.row_of and key not in new_items:
+                        new_items[key] = {"key": key, "sid": sid, "pos": pos, "role": m["role"]}
+                        texts.append(m["content"])
+            if not new_items:
+                return 0
+            new_items = list(new_items.values())
+            vecs = self.embedder.embed(texts)
+            start = len(self.items)
+            needed = start + len(new_items)
+            if needed > self.matrix.shape[0]:
+                self._create(max(needed, self.matrix.shape[0] * 2), copy_rows=start)
+            self.matrix[start:needed] = vecs
+            self.matrix.flush()
+            # Vektor dulu baru key: key yang ke-append selalu punya baris di matrix
+            self._append_entries(new_items)
+            for i, item in enumerate(new_items):
+                self.row_of[item["key"]] = start + i
+            self.items.extend(new_items)
+            self._sid_col = None
+            return len(new_items)
+
+    def forget(self, sid):
+        """Hapus memory satu session (vektor di-nol-in, key-nya di-tombstone)"""
+        with self._locked():
+            self._refresh()
+            rows = self._tombstone(sid)
+            if not rows:
+                return 0
+            self.matrix[rows] = 0.0
+            self.matrix.flush()
+            self._append_entries([{"forget": sid}])
+            return len(rows)
+
+    def search(self, query, sessions, k=4, exclude_keys=(), min_score=0.25):
+        """Top-k pesan paling mirip (cosine) dengan query.
+
+        ``sessions`` = {sid: (title, messages)} session yang masih hidup; isi
+        hit diambil dari situ, baris session lain di-skip.
+        """
+        with self._locked():
+            self._refresh()
+            count = len(self.items)
+            if not count or not query:
+                return []
+            q = self.embedder.embed([query])[0]
+            scores = np.asarray(self.matrix[:count] @ q)
+            if self._sid_col is None:
+                self._sid_col = np.array([item["sid"] for item in self.items], dtype=object)
+            scores[~np.isin(self._sid_col[:count], list(sessions))] = -1.0
+            rows = [self.row_of[key] for key in exclude_keys if key in self.row_of]
+            scores[[r for r in rows if r < count]] = -1.0
+            items = self.items
+        top = np.argpartition(-scores, min(k, count - 1))[:k] if count > k else np.arange(count)
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            if scores[i] < min_score:
+                continue
+            item = items[i]
+            title, messages = sessions[item["sid"]]
+            m = messages[item["pos"]] if item["pos"] < len(messages) else None
+            # Pesan di posisi itu udah berubah -> skip daripada salah kutip
+            if m is None or message_key(item["sid"], m) != item["key"]:
+                continue
+            hits.append({"session": title, "role": item["role"], "content": m["content"], "score": float(scores[i])})
+        return hits
+
+
+def _file_id(path):
+    """(inode, size) file, None kalau belum ada"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size
@@ -0,0 +1,72 @@
+"""Auto routing engine ZETRO: classifier lokal (regex + panjang) per turn.
+
+Tiap engine di tabel ``ENGINES`` declare capability (``text``, ``vision``,
+``reasoning``, ``image_gen``), context size, cost class dan speed class.
+``classify_turn`` nentuin capability yang dibutuhin turn ini, lalu
+``pick_engine`` milih engine termurah (lalu tercepat) yang sanggup.
+Cuma regex yang udah di-compile + hitung panjang, jadi jauh di bawah 1 ms.
+"""
+import re
+
+# Cuma awal pesan yang di-scan, biar waktu classify ga ikut naik sama panjang paste
+SCAN_CHARS = 2000
+LONG_TURN_TOKENS = 150
+REASONING_MIN_TOKENS = 20
+
+# Image gen cuma kalau eksplisit: command /img, atau kalimat perintah yang
+# DIAWALI kata kerja + objek gambar ("gambarin kucing", "generate an image of ...").
+# Verb + "image" di tengah kalimat ("how do I create a docker image") bukan image gen.
+IMAGE_CMD_RE = re.compile(r"^\s*/(img|image|imagine)\b", re.IGNORECASE)
+IMAGE_GEN_RE = re.compile(
+    r"^\s*(?:(?:please|pls|tolong|coba|can you|could you)\s+)?"
+    r"(?:(?:gambar(?:in|kan)|lukis(?:in|kan)?)\b"
+    r"|(?:draw|paint|sketch)\s+(?:me\s+)?(?:an?|the|some)\b"
+    r"|(?:generate|create|make|render|bikin(?:in|kan)?|buat(?:in|kan)?)\s+"
+    r"(?:(?:me|an?|the|sebuah|satu|aku|gue)\s+)?(?:\S+\s+){0,2}?"
+    r"(?:image|picture|photo|illustration|drawing|wallpaper|poster|logo|gambar|foto|ilustrasi|lukisan)s?\b)",
+    re.IGNORECASE,
+)
+# Istilah teknis = pertanyaan coding / tooling, bukan minta dibikinin gambar
+TECH_RE = re.compile(
+    r"\b(docker\w*|container|kubernetes|k8s|registry|function|fungsi|method|component|komponen|upload\w*"
+    r"|resize|crop|compress\w*|convert|python|javascript|typescript|react|vue|css|html|api|s3|bucket|code|kode"
+    r"|script|skrip|class|database|server|file|matplotlib|opencv|pillow|numpy|library|npm|pip|flask|django)\b",
+    re.IGNORECASE,
+)
+REASONING_RE = re.compile(
+    r"\b(why|prove|proof|derive|step[- ]by[- ]step|analy[sz]e|compare|optimi[sz]e|algorithm|debug|complexity"
+    r"|kenapa|mengapa|buktikan|jelaskan|analisis|bandingkan|hitung|langkah|algoritma|rumus|turunan|integral)\b",
+    re.IGNORECASE,
+)
+CODE_RE = re.compile(r"```|\bdef \w+\(|\bclass \w+|#include|\bfunction\s*\w*\(|\bSELECT\b.+\bFROM\b", re.IGNORECASE | re.DOTALL)
+
+
+def classify_turn(text, has_images=False):
+    """Capability yang dibutuhin turn ini: vision / image_gen / reasoning / text"""
+    if has_images:
+        return "vision"
+    head = text[:SCAN_CHARS]
+    if IMAGE_CMD_RE.match(head):
+        return "image_gen"
+    if IMAGE_GEN_RE.match(head) and not TECH_RE.search(head) and not CODE_RE.search(head):
+        return "image_gen"
+    tokens = len(text) // 4
+    if tokens >= LONG_TURN_TOKENS or CODE_RE.search(head):
+        return "reasoning"
+    if tokens >= REASONING_MIN_TOKENS and REASONING_RE.search(head):
+        return "reasoning"
+    return "text"
+
+
+def pick_engine(engines, need, prompt_tokens=0):
+    """Nama engine termurah (tie-break: tercepat) yang punya capability + context cukup"""
+    capable = [
+        (data["cost"], data["speed"], name)
+        for name, data in engines.items()
+        if data.get("auto", True) and need in data.get("caps", ())
+    ]
+    fits = [c for c in capable if engines[c[2]]["context"] >= prompt_tokens]
+    candidates = fits or sorted(capable, key=lambda c: -engines[c[2]]["context"])[:1]
+    if not candidates:
+        return None
+    return min(candidates)[2]
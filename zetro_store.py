@@ -0,0 +1,402 @@
+"""Storage backend ZETRO (users + chat history), bisa di-share antar replica.
+
+Backend dipilih dari URL (secret / env ``ZETRO_STORE_URL``):
+
+- kosong / ``file://<folder>``  -> FileStore, file JSON lokal (default, perilaku lama)
+- ``sqlite:///<path>.db``       -> SQLiteStore, satu file DB (WAL) yang di-share
+- ``redis://host:port/db``      -> RedisStore, butuh package ``redis``
+- ``fakeredis://``              -> RedisStore di atas fakeredis (stand-in lokal buat test)
+
+History disimpan per session (bukan satu blob per user), jadi dua replica
+yang nulis session berbeda ga saling timpa. Tiap user punya version counter
+yang naik tiap write; replica lain cukup cek angka itu tiap rerun buat tahu
+cache-nya basi (cross-replica invalidation). ``save_session`` /
+``delete_sessions`` balikin ``(before, after)``: version tepat sebelum dan
+sesudah write ini. Kalau ``before`` beda sama version yang terakhir di-load,
+ada write lain di tengah jalan, jadi ``after`` jangan diadopsi. Waktu write terakhir tiap
+session juga dicatat (``session_times``) buat tiering ke cold archive;
+``delete_cold_sessions`` ngecek ulang waktu itu di dalam lock / transaksi
+yang sama dengan delete-nya, jadi write user yang barusan masuk ga ikut kehapus.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def _user_hash(username):
+    return hashlib.md5(username.encode()).hexdigest()
+
+
+class FileStore:
+    """users.json + user_<md5>.json di satu folder (format lama tetap kebaca).
+
+    JSON history ditulis compact (tanpa indent). Waktu write per session ada
+    di sidecar user_<md5>.touch.json yang selalu lengkap (semua title), jadi
+    ``session_times`` ga perlu parse history. History lama tanpa sidecar
+    di-backfill sekali pakai mtime file history-nya.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.users_file = os.path.join(folder, "users.json")
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _history_file(self, username):
+        return os.path.join(self.folder, f"user_{_user_hash(username)}.json")
+
+    def _touch_file(self, username):
+        return os.path.join(self.folder, f"user_{_user_hash(username)}.touch.json")
+
+    def _read_json(self, path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+            return {}
+
+    def _write_json(self, path, data, **kwargs):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **kwargs)
+        os.replace(tmp_path, path)
+
+    def load_users(self):
+        return self._read_json(self.users_file)
+
+    def add_user(self, username, password_hash):
+        with self.lock:
+            users = self.load_users()
+            if username in users:
+                return False
+            users[username] = password_hash
+            self._write_json(self.users_file, users)
+            return True
+
+    def load_history(self, username):
+        return self._read_json(self._history_file(username))
+
+    def _load_touched(self, username, history=None):
+        """Sidecar waktu write; kalau belum ada, backfill dari history + mtime"""
+        touch_path = self._touch_file(username)
+        if os.path.exists(touch_path):
+            return self._read_json(touch_path)
+        path = self._history_file(username)
+        try:
+            fallback = os.stat(path).st_mtime
+        except OSError:
+            return {}
+        if history is None:
+            history = self._read_json(path)
+        touched = {title: fallback for title in history}
+        self._write_json(touch_path, touched)
+        return touched
+
+    def load_sessions(self, username, titles):
+        history = self.load_history(username)
+        return {title: history[title] for title in titles if title in history}
+
+    def save_session(self, username, title, messages):
+        with self.lock:
+            before = self.history_version(username)
+            path = self._history_file(username)
+            history = self._read_json(path)
+            touched = self._load_touched(username, history)
+            history[title] = messages
+            self._write_json(path, history, ensure_ascii=False, separators=(",", ":"))
+            touched[title] = time.time()
+            self._write_json(self._touch_file(username), touched)
+            return before, self.history_version(username)
+
+    def delete_session(self, username, title):
+        return self.delete_sessions(username, [title])
+
+    def delete_sessions(self, username, titles):
+        with self.lock:
+            before = self.history_version(username)
+            self._delete_locked(username, titles)
+            return before, self.history_version(username)
+
+    def delete_cold_sessions(self, username, titles, cutoff):
+        """Hapus session yang waktu write-nya masih < cutoff; balikin title yang kehapus"""
+        with self.lock:
+            touched = self._load_touched(username)
+            cold = [title for title in titles if title in touched and touched[title] < cutoff]
+            self._delete_locked(username, cold)
+        return cold
+
+    def _delete_locked(self, username, titles):
+        path = self._history_file(username)
+        history = self._read_json(path)
+        touched = self._load_touched(username, history)
+        removed = [history.pop(title) for title in titles if title in history]
+        if removed:
+            self._write_json(path, history, ensure_ascii=False, separators=(",", ":"))
+            for title in titles:
+                touched.pop(title, None)
+            self._write_json(self._touch_file(username), touched)
+
+    def session_times(self, username):
+        """{title: waktu write terakhir} untuk semua session hot (cuma baca sidecar)"""
+        return self._load_touched(username)
+
+    def history_version(self, username):
+        try:
+            return os.stat(self._history_file(username)).st_mtime_ns
+        except OSError:
+            return 0
+
+
+class SQLiteStore:
+    """Satu file SQLite (WAL) yang bisa dibuka banyak proses / replica di host yang sama"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password_hash TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        title TEXT NOT NULL,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (username, title)
+    );
+    CREATE TABLE IF NOT EXISTS versions (
+        username TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        """Satu connection per thread (autocommit; write lewat _tx)"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _tx(self):
+        return _Transaction(self._conn())
+
+    def _bump(self, conn, username):
+        conn.execute(
+            "INSERT INTO versions (username, version) VALUES (?, 1) "
+            "ON CONFLICT(username) DO UPDATE SET version = version + 1",
+            (username,),
+        )
+        return conn.execute("SELECT version FROM versions WHERE username = ?", (username,)).fetchone()[0]
+
+    def load_users(self):
+        return dict(self._conn().execute("SELECT username, password_hash FROM users").fetchall())
+
+    def add_user(self, username, password_hash):
+        with self._tx() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)",
+                (username, password_hash),
+            )
+            return cur.rowcount == 1
+
+    def load_history(self, username):
+        rows = self._conn().execute(
+            "SELECT title, data FROM sessions WHERE username = ? ORDER BY id", (username,)
+        ).fetchall()
+        return {title: json.loads(data) for title, data in rows}
+
+    def save_session(self, username, title, messages):
+        data = json.dumps(messages, ensure_ascii=False)
+        with self._tx() as conn:
+            conn.execute(
+                "INSERT INTO sessions (username, title, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username, title) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (username, title, data, time.time()),
+            )
+            after = self._bump(conn, username)
+            return after - 1, after
+
+    def delete_session(self, username, title):
+        return self.delete_sessions(username, [title])
+
+    def delete_sessions(self, username, titles):
+        with self._tx() as conn:
+            conn.executemany(
+                "DELETE FROM sessions WHERE username = ? AND title = ?", [(username, title) for title in titles]
+            )
+            after = self._bump(conn, username)
+            return after - 1, after
+
+    def load_sessions(self, username, titles):
+        conn = self._conn()
+        out = {}
+        for title in titles:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE username = ? AND title = ?", (username, title)
+            ).fetchone()
+            if row:
+                out[title] = json.loads(row[0])
+        return out
+
+    def delete_cold_sessions(self, username, titles, cutoff):
+        """Hapus session yang updated_at-nya masih < cutoff (satu transaksi); balikin title yang kehapus"""
+        with self._tx() as conn:
+            cold = []
+            for title in titles:
+                cur = conn.execute(
+                    "DELETE FROM sessions WHERE username = ? AND title = ? AND updated_at < ?",
+                    (username, title, cutoff),
+                )
+                if cur.rowcount:
+                    cold.append(title)
+            if cold:
+                self._bump(conn, username)
+        return cold
+
+    def session_times(self, username):
+        rows = self._conn().execute("SELECT title, updated_at FROM sessions WHERE username = ?", (username,))
+        return dict(rows.fetchall())
+
+    def history_version(self, username):
+        row = self._conn().execute("SELECT version FROM versions WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else 0
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK di connection autocommit"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class RedisStore:
+    """Backend Redis-protocol: hash per user buat session + zset buat urutan"""
+
+    def __init__(self, client, prefix="zetro"):
+        self.r = client
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def load_users(self):
+        return {k.decode(): v.decode() for k, v in self.r.hgetall(self._key("users")).items()}
+
+    def add_user(self, username, password_hash):
+        return bool(self.r.hsetnx(self._key("users"), username, password_hash))
+
+    def load_history(self, username):
+        order = [t.decode() for t in self.r.zrange(self._key("order", username), 0, -1)]
+        if not order:
+            return {}
+        raw = self.r.hmget(self._key("history", username), order)
+        return {title: json.loads(data) for title, data in zip(order, raw) if data is not None}
+
+    def save_session(self, username, title, messages):
+        pipe = self.r.pipeline()
+        pipe.hset(self._key("history", username), title, json.dumps(messages, ensure_ascii=False))
+        pipe.zadd(self._key("order", username), {title: time.time()}, nx=True)
+        pipe.zadd(self._key("touched", username), {title: time.time()})
+        pipe.incr(self._key("version", username))
+        after = pipe.execute()[-1]
+        return after - 1, after
+
+    def delete_session(self, username, title):
+        return self.delete_sessions(username, [title])
+
+    def delete_sessions(self, username, titles):
+        pipe = self.r.pipeline()
+        if titles:
+            pipe.hdel(self._key("history", username), *titles)
+            pipe.zrem(self._key("order", username), *titles)
+            pipe.zrem(self._key("touched", username), *titles)
+        pipe.incr(self._key("version", username))
+        after = pipe.execute()[-1]
+        return after - 1, after
+
+    def load_sessions(self, username, titles):
+        if not titles:
+            return {}
+        raw = self.r.hmget(self._key("history", username), list(titles))
+        return {title: json.loads(data) for title, data in zip(titles, raw) if data is not None}
+
+    def delete_cold_sessions(self, username, titles, cutoff):
+        """Hapus session yang waktu write-nya masih < cutoff (WATCH/MULTI); balikin title yang kehapus"""
+        history, order, touched = (self._key(k, username) for k in ("history", "order", "touched"))
+
+        def tx(pipe):
+            cold = []
+            for title in titles:
+                ts = pipe.zscore(touched, title)
+                if ts is None:
+                    ts = pipe.zscore(order, title)
+                if ts is not None and ts < cutoff:
+                    cold.append(title)
+            pipe.multi()
+            if cold:
+                pipe.hdel(history, *cold)
+                pipe.zrem(order, *cold)
+                pipe.zrem(touched, *cold)
+                pipe.incr(self._key("version", username))
+            return cold
+
+        # Kalau ada save_session di tengah-tengah, WATCH gagal dan tx diulang
+        return self.r.transaction(tx, history, touched, value_from_callable=True)
+
+    def session_times(self, username):
+        # Session dari sebelum ada zset "touched" pakai waktu dibuatnya
+        created = self.r.zrange(self._key("order", username), 0, -1, withscores=True)
+        touched = dict(self.r.zrange(self._key("touched", username), 0, -1, withscores=True))
+        return {t.decode(): touched.get(t, ts) for t, ts in created}
+
+    def history_version(self, username):
+        value = self.r.get(self._key("version", username))
+        return int(value) if value else 0
+
+
+_FAKE_SERVER = None
+
+
+def open_store(url, default_folder):
+    """Bikin store dari URL; kosong = FileStore di default_folder"""
+    if not url:
+        return FileStore(default_folder)
+    if url.startswith("file://"):
+        return FileStore(url[len("file://"):] or default_folder)
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith("fakeredis://"):
+        import fakeredis
+
+        # Satu FakeServer per proses biar semua store di proses ini lihat data yang sama
+        global _FAKE_SERVER
+        if _FAKE_SERVER is None:
+            _FAKE_SERVER = fakeredis.FakeServer()
+        return RedisStore(fakeredis.FakeRedis(server=_FAKE_SERVER))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+
+        return RedisStore(redis.Redis.from_url(url))
+    raise ValueError(f"ZETRO_STORE_URL ga dikenal: {url}")
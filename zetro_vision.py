@@ -0,0 +1,39 @@
+"""Preprocessing gambar untuk ZETRO vision (decode, resize, encode).
+
+Fungsi di sini dipanggil paralel lewat worker pool (thread) dari
+streamlit_app.py; PIL lepas GIL pas decode / resize / encode.
+"""
+import base64
+import hashlib
+import io
+
+from PIL import Image
+
+# Sisi terpanjang gambar yang dikirim ke model vision
+MAX_IMAGE_SIDE = 1024
+JPEG_QUALITY = 85
+
+
+def image_hash(image_data):
+    """Hash konten gambar (dipakai buat dedup + cache encode)"""
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def preprocess_image(image_data):
+    """Decode + resize + encode satu gambar jadi payload base64 JPEG"""
+    result = {"hash": image_hash(image_data), "info": "Image analysis available"}
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        width, height = img.size
+        result["info"] = f"Size: {width}x{height}, Mode: {img.mode}"
+
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        result["b64"] = base64.b64encode(buf.getvalue()).decode("utf-8")
+    except Exception:
+        # Gagal decode: kirim apa adanya, biar model yang nentuin
+        result["b64"] = base64.b64encode(image_data).decode("utf-8")
+    return result